@@ -1,106 +1,351 @@
-import sqlite3
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
 import os
+import sys
+import time
+import argparse
+import hashlib
+import inspect
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_read
+from database.watermarks import latest_batch
+from database.attendance import NUM_LECTURES, FULL_MASK, lecture_matrix, longest_absence_streak
 
 # Configuration
 DB_PATH = 'student_performance.db'
 OUTPUT_DIR = 'docs/images'
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, 'eda_manifest.json')
+CHART_STYLE = 'dark_background'
+CHART_PALETTE = 'bright'
 
-def run_eda():
-    print("Starting Deep Analysis EDA...")
-    conn = sqlite3.connect(DB_PATH)
-    
-    # Set style
-    plt.style.use('dark_background')
-    sns.set_palette("bright")
-
-    # 1. Subject Performance Gap (Heatmap)
-    print("Generating Performance Gap Heatmap...")
-    query_gap = """
-    SELECT 
-        strftime('%Y-%m', sc.exam_date) as month,
-        s.subject_name,
-        AVG(sc.total_mark) - (SELECT AVG(total_mark) FROM scores s2 
-                              WHERE strftime('%Y-%m', s2.exam_date) = strftime('%Y-%m', sc.exam_date)) as performance_gap
-    FROM scores sc
-    JOIN subjects s ON sc.subject_id = s.subject_id
-    GROUP BY month, s.subject_name
-    ORDER BY month;
+CHUNK_SIZE = 250_000   # Score rows per chunk; memory is bounded by this, not the table size
+HASH_DECIMALS = 6      # Chart data is rounded to this before hashing (see _chart_hash)
+
+# Every chart is derived from this one streamed scan of scores; names are joined after aggregation
+LOAD_QUERY = """
+SELECT exam_month, subject_key, teacher_key, total_mark, total_attendance, attendance_mask
+FROM scores
+"""
+LOAD_DTYPES = {
+    'subject_key': 'Int32',
+    'teacher_key': 'Int32',
+    'total_mark': 'float64',
+    'total_attendance': 'float64',
+    'attendance_mask': 'int16',
+}
+
+# Mergeable accumulators: name -> (group keys, value column). Each holds
+# count, sum and sum of squares of the value per group.
+ACCUMULATORS = {
+    'month_subject_mark': (['exam_month', 'subject_key'], 'total_mark'),
+    'month_mark': (['exam_month'], 'total_mark'),
+    'month_attendance': (['exam_month'], 'total_attendance'),
+    'subject_mark': (['subject_key'], 'total_mark'),
+    'teacher_subject_mark': (['teacher_key', 'subject_key'], 'total_mark'),
+}
+STAT_MERGE = {'count': 'sum', 'sum': 'sum', 'sumsq': 'sum'}
+
+def _timed(timings, stage, func, *args):
+    """Run func(*args), recording its wall time under `stage`."""
+    start = time.perf_counter()
+    result = func(*args)
+    timings[stage] = time.perf_counter() - start
+    print(f"  {stage}: {timings[stage]:.2f}s")
+    return result
+
+def _iter_frames(conn, chunk_size=CHUNK_SIZE):
+    """Stream the scores columns the charts need as typed chunks of `chunk_size` rows."""
+    for frame in pd.read_sql_query(LOAD_QUERY, conn, dtype=LOAD_DTYPES, chunksize=chunk_size):
+        frame['exam_month'] = frame['exam_month'].fillna('Unknown').astype('category')
+        yield frame
+
+def _load_names(conn):
+    """Subject and teacher display names, indexed by key."""
+    subjects = pd.read_sql_query("SELECT subject_key, subject_name FROM subjects", conn, index_col='subject_key')
+    teachers = pd.read_sql_query(
+        "SELECT teacher_key, first_name || ' ' || last_name AS teacher_name FROM teachers", conn, index_col='teacher_key'
+    )
+    return subjects['subject_name'], teachers['teacher_name']
+
+def _group_stats(frame, keys, column):
+    """count/sum/sumsq of `column` per group of `keys`, with plain (non-categorical) keys."""
+    values = frame[column]
+    grouped = values.groupby([frame[key] for key in keys], observed=True)
+    stats = grouped.agg(['count', 'sum'])
+    stats['sumsq'] = (values * values).groupby([frame[key] for key in keys], observed=True).sum()
+    stats = stats.reset_index()
+    if 'exam_month' in keys:
+        stats['exam_month'] = stats['exam_month'].astype(str)
+    return stats
+
+def _partial(frame):
+    """Accumulators for one chunk of score rows."""
+    part = {name: _group_stats(frame, keys, column) for name, (keys, column) in ACCUMULATORS.items()}
+    # Histogram of mask values: exact, fixed-size and enough for every lecture statistic
+    part['mask_counts'] = np.bincount(frame['attendance_mask'].to_numpy() & FULL_MASK, minlength=FULL_MASK + 1)
+    return part
+
+def _merge(acc, part):
+    """Combine two sets of accumulators.
+
+    Counts are exact; float sums depend on the chunking only in their last
+    bits, through the order in which they are added.
     """
-    df_gap = pd.read_sql_query(query_gap, conn)
-    
-    if not df_gap.empty:
-        pivot_gap = df_gap.pivot(index='subject_name', columns='month', values='performance_gap')
-        plt.figure(figsize=(14, 8))
-        sns.heatmap(pivot_gap, cmap='coolwarm', center=0, annot=False)
-        plt.title('Subject Performance Gap vs Monthly Average', fontsize=16, color='white')
-        plt.xlabel('Month')
-        plt.ylabel('Subject')
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, 'performance_gap_heatmap.png'))
-        plt.close()
-
-    # 2. Attendance Volatility
-    print("Generating Attendance Volatility Chart...")
-    query_volatility = """
-    SELECT 
-        strftime('%Y-%m', exam_date) as month,
-        (MAX(total_attendance) - MIN(total_attendance)) as attendance_variance,
-        AVG(total_attendance) as avg_attendance
-    FROM scores
-    GROUP BY month
-    ORDER BY month;
+    if acc is None:
+        return part
+    merged = {'mask_counts': acc['mask_counts'] + part['mask_counts']}
+    for name, (keys, _) in ACCUMULATORS.items():
+        both = pd.concat([acc[name], part[name]], ignore_index=True)
+        merged[name] = both.groupby(keys, sort=True).agg(STAT_MERGE).reset_index()
+    return merged
+
+def _accumulate(frames):
+    """Fold a stream of score chunks into one set of accumulators; returns (acc, rows)."""
+    acc, rows = None, 0
+    for frame in frames:
+        acc = _merge(acc, _partial(frame))
+        rows += len(frame)
+    return acc, rows
+
+def _mean(stats, keys):
+    stats = stats.set_index(keys)
+    return stats['sum'] / stats['count']
+
+def _finalize(acc, subject_names, teacher_names):
+    """Turn merged accumulators into every chart's data."""
+    # 1. Subject mean per month minus that month's overall mean
+    month_avg = _mean(acc['month_mark'], ['exam_month'])
+    subject_month_avg = _mean(acc['month_subject_mark'], ['exam_month', 'subject_key'])
+    gap = subject_month_avg.sub(month_avg, level='exam_month').rename('performance_gap').reset_index()
+    gap['subject_name'] = gap['subject_key'].map(subject_names)
+    pivot_gap = gap.pivot(index='subject_name', columns='exam_month', values='performance_gap')
+
+    # 2. Population variance and mean of attendance per month
+    attendance = acc['month_attendance'].set_index('exam_month')
+    avg_attendance = attendance['sum'] / attendance['count']
+    volatility = pd.DataFrame({
+        'attendance_variance': attendance['sumsq'] / attendance['count'] - avg_attendance * avg_attendance,
+        'avg_attendance': avg_attendance,
+    }).rename_axis('month').reset_index()
+
+    # 3. Teacher mean per subject minus the subject's overall mean
+    subject_avg = _mean(acc['subject_mark'], ['subject_key'])
+    teacher_subject_avg = _mean(acc['teacher_subject_mark'], ['teacher_key', 'subject_key'])
+    value = teacher_subject_avg.sub(subject_avg, level='subject_key').rename('value_added').reset_index()
+    value['teacher_name'] = value['teacher_key'].map(teacher_names)
+    value['subject_name'] = value['subject_key'].map(subject_names)
+    value = value.sort_values('value_added', ascending=False)
+
+    # 4. Per-lecture attendance and absence streaks, weighted by the mask histogram
+    counts = acc['mask_counts']
+    lectures = None
+    if counts.sum():
+        masks = np.arange(FULL_MASK + 1)
+        rates = (lecture_matrix(masks) * counts[:, None]).sum(axis=0) / counts.sum() * 100
+        streaks = np.bincount(longest_absence_streak(masks), weights=counts, minlength=NUM_LECTURES + 1).astype(np.int64)
+        lectures = (rates, streaks)
+
+    return {'gap': pivot_gap, 'volatility': volatility, 'value_added': value, 'lectures': lectures}
+
+def _plotting():
+    """Import matplotlib and seaborn on first use; they dominate the script's startup.
+
+    Runs where every chart is unchanged never load them.
     """
-    df_vol = pd.read_sql_query(query_volatility, conn)
-    
-    if not df_vol.empty:
-        plt.figure(figsize=(12, 6))
-        # Dual axis
-        ax1 = sns.barplot(data=df_vol, x='month', y='attendance_variance', color='#b537f2', alpha=0.6)
-        ax2 = ax1.twinx()
-        sns.lineplot(data=df_vol, x='month', y='avg_attendance', ax=ax2, color='#00f5ff', marker='o')
-        
-        ax1.set_ylabel('Attendance Variance (Range)', color='#b537f2')
-        ax2.set_ylabel('Average Attendance', color='#00f5ff')
-        plt.title('Monthly Attendance: Average vs Volatility', fontsize=16, color='white')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, 'attendance_volatility.png'))
-        plt.close()
-
-    # 3. Teacher Value Added (Scatter)
-    print("Generating Teacher Value Added Chart...")
-    query_value = """
-    SELECT 
-        t.first_name || ' ' || t.last_name as teacher_name,
-        s.subject_name,
-        AVG(sc.total_mark) - (SELECT AVG(total_mark) FROM scores s2 WHERE s2.subject_id = sc.subject_id) as value_added
-    FROM scores sc
-    JOIN teachers t ON sc.teacher_id = t.teacher_id
-    JOIN subjects s ON sc.subject_id = s.subject_id
-    GROUP BY t.teacher_id, s.subject_name
-    ORDER BY value_added DESC;
+    import matplotlib
+    matplotlib.use('Agg')  # Charts only go to files; Agg is also safe in worker processes
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+def _plot_gap(pivot_gap, path):
+    plt, sns = _plotting()
+    plt.figure(figsize=(14, 8))
+    sns.heatmap(pivot_gap, cmap='coolwarm', center=0, annot=False)
+    plt.title('Subject Performance Gap vs Monthly Average', fontsize=16, color='white')
+    plt.xlabel('Month')
+    plt.ylabel('Subject')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def _plot_volatility(df_vol, path):
+    plt, sns = _plotting()
+    plt.figure(figsize=(12, 6))
+    # Dual axis
+    ax1 = sns.barplot(data=df_vol, x='month', y='attendance_variance', color='#b537f2', alpha=0.6)
+    ax2 = ax1.twinx()
+    sns.lineplot(data=df_vol, x='month', y='avg_attendance', ax=ax2, color='#00f5ff', marker='o')
+
+    ax1.set_ylabel('Attendance Variance', color='#b537f2')
+    ax2.set_ylabel('Average Attendance', color='#00f5ff')
+    plt.title('Monthly Attendance: Average vs Volatility', fontsize=16, color='white')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def _plot_value_added(df_value, path):
+    plt, sns = _plotting()
+    plt.figure(figsize=(12, 6))
+    sns.scatterplot(data=df_value, x='value_added', y='teacher_name', hue='subject_name', s=100)
+    plt.axvline(0, color='white', linestyle='--', alpha=0.5)
+    plt.title('Teacher Value Added (Score vs Subject Avg)', fontsize=16, color='white')
+    plt.xlabel('Value Added (Points above/below avg)', fontsize=12)
+    plt.ylabel('Teacher', fontsize=12)
+    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+def _plot_lectures(lectures, path):
+    plt, sns = _plotting()
+    rates, streaks = lectures
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    sns.barplot(x=list(range(1, NUM_LECTURES + 1)), y=rates, color='#00f5ff', ax=ax1)
+    ax1.set_title('Attendance Rate per Lecture', fontsize=14, color='white')
+    ax1.set_xlabel('Lecture')
+    ax1.set_ylabel('Attended (%)')
+    sns.barplot(x=list(range(len(streaks))), y=streaks, color='#b537f2', ax=ax2)
+    ax2.set_title('Longest Consecutive Absence Streak', fontsize=14, color='white')
+    ax2.set_xlabel('Lectures missed in a row')
+    ax2.set_ylabel('Score records')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+# Chart file -> (log label, data key from _finalize, plot function); one render task each
+CHARTS = {
+    'performance_gap_heatmap.png': ('Performance Gap Heatmap', 'gap', _plot_gap),
+    'attendance_volatility.png': ('Attendance Volatility Chart', 'volatility', _plot_volatility),
+    'teacher_value_added.png': ('Teacher Value Added Chart', 'value_added', _plot_value_added),
+    'lecture_attendance.png': ('Lecture Attendance Chart', 'lectures', _plot_lectures),
+}
+
+def _chart_tasks(data, output_dir=OUTPUT_DIR):
+    """One (label, plot function, chart data, output path) task per chart with data."""
+    tasks = []
+    for filename, (label, key, plot) in CHARTS.items():
+        chart_data = data[key]
+        if chart_data is None or getattr(chart_data, 'empty', False):
+            continue
+        tasks.append((label, plot, chart_data, os.path.join(output_dir, filename)))
+    return tasks
+
+def _render_chart(task):
+    """Worker: draw one chart from its precomputed data and save it as PNG."""
+    label, plot, chart_data, path = task
+    start = time.perf_counter()
+    plt, sns = _plotting()
+    plt.style.use(CHART_STYLE)
+    sns.set_palette(CHART_PALETTE)
+    plot(chart_data, path)
+    return label, time.perf_counter() - start
+
+def _chart_hash(plot, chart_data):
+    """Hash of a chart's input data, plot code and style; equal hash = identical PNG.
+
+    Data is rounded to HASH_DECIMALS first, so summation-order noise from a
+    different chunk size does not count as a change (adding 0.0 turns -0.0
+    into 0.0).
     """
-    df_value = pd.read_sql_query(query_value, conn)
-    
-    if not df_value.empty:
-        plt.figure(figsize=(12, 6))
-        sns.scatterplot(data=df_value, x='value_added', y='teacher_name', hue='subject_name', s=100)
-        plt.axvline(0, color='white', linestyle='--', alpha=0.5)
-        plt.title('Teacher Value Added (Score vs Subject Avg)', fontsize=16, color='white')
-        plt.xlabel('Value Added (Points above/below avg)', fontsize=12)
-        plt.ylabel('Teacher', fontsize=12)
-        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUTPUT_DIR, 'teacher_value_added.png'))
-        plt.close()
+    h = hashlib.sha256()
+    h.update(inspect.getsource(plot).encode())
+    h.update(f"{CHART_STYLE}|{CHART_PALETTE}".encode())
+    if isinstance(chart_data, pd.DataFrame):
+        floats = chart_data.select_dtypes('float').columns
+        chart_data = chart_data.assign(**{name: chart_data[name].round(HASH_DECIMALS) + 0.0 for name in floats})
+        h.update(repr(list(chart_data.columns)).encode())
+        h.update(pd.util.hash_pandas_object(chart_data, index=True).to_numpy().tobytes())
+    else:
+        for array in chart_data:
+            array = np.asarray(array)
+            if array.dtype.kind == 'f':
+                array = np.round(array, HASH_DECIMALS) + 0.0
+            array = np.ascontiguousarray(array)
+            h.update(str(array.dtype).encode())
+            h.update(array.tobytes())
+    return h.hexdigest()
+
+def _load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def _save_manifest(manifest, path=MANIFEST_PATH):
+    # Write-then-rename so an interrupted run never leaves a truncated manifest
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _stale_tasks(tasks, manifest, force=False):
+    """Tasks whose PNG is missing or whose input hash differs from the manifest."""
+    stale = []
+    for task in tasks:
+        label, plot, chart_data, path = task
+        digest = _chart_hash(plot, chart_data)
+        if force or manifest.get(os.path.basename(path)) != digest or not os.path.exists(path):
+            stale.append((task, digest))
+    return stale
+
+def render_charts(tasks, jobs=None):
+    """Render chart tasks on a process pool (inline when jobs == 1)."""
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks)) or 1
+    print(f"Rendering {len(tasks)} charts ({jobs} jobs)...")
+    if jobs == 1:
+        results = map(_render_chart, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = executor.map(_render_chart, tasks)
+    try:
+        for label, seconds in results:
+            print(f"  {label}: {seconds:.2f}s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
+def run_eda(jobs=None, force=False, chunk_size=CHUNK_SIZE):
+    print("Starting Deep Analysis EDA...")
+    timings = {}
+    conn = connect_read(DB_PATH)
+    print(f"Data at batch {latest_batch(conn)}")
+
+    # One streamed scan, folded chunk by chunk into mergeable accumulators
+    print(f"Scanning scores in chunks of {chunk_size} rows...")
+    subject_names, teacher_names = _load_names(conn)
+    acc, rows = _timed(timings, 'scan', _accumulate, _iter_frames(conn, chunk_size))
     conn.close()
-    print("Deep Analysis EDA Complete.")
+    if acc is None:
+        print("No score rows to analyse.")
+        return
+    print(f"Aggregating {rows} score rows...")
+    data = _timed(timings, 'aggregate', _finalize, acc, subject_names, teacher_names)
+
+    # Each chart is an independent task; only charts whose inputs changed are redrawn
+    tasks = _chart_tasks(data)
+    manifest = _load_manifest()
+    stale = _stale_tasks(tasks, manifest, force)
+    print(f"{len(tasks) - len(stale)} of {len(tasks)} charts unchanged")
+    if stale:
+        _timed(timings, 'render', render_charts, [task for task, _ in stale], jobs)
+        for (label, plot, chart_data, path), digest in stale:
+            manifest[os.path.basename(path)] = digest
+        _save_manifest(manifest)
+    print(f"Deep Analysis EDA Complete in {sum(timings.values()):.2f}s.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the EDA charts in docs/images.")
+    parser.add_argument('--jobs', type=int, default=None, help="Chart rendering processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="Re-render every chart, even if its inputs are unchanged")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Score rows read per chunk (bounds memory)")
+    args = parser.parse_args()
+
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
-    run_eda()
+    run_eda(jobs=args.jobs, force=args.force, chunk_size=args.chunk_size)
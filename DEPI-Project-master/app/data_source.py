@@ -0,0 +1,87 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_read
+
+# Only the columns the dashboard pages use; names are resolved here, keys stay integers.
+# Predictions come from models/batch_score.py and are NULL until it has run.
+SCORES_QUERY = """
+SELECT
+    sc.score_key AS score_id,
+    sc.student_key,
+    st.first_name || ' ' || st.last_name AS student_name,
+    st.class,
+    st.gender,
+    s.subject_name,
+    t.first_name || ' ' || t.last_name AS teacher_name,
+    sc.exam_1,
+    sc.exam_2,
+    sc.exam_3,
+    sc.total_attendance,
+    sc.total_mark,
+    sc.exam_date,
+    p.predicted_mark,
+    p.predicted_group,
+    p.prob_low
+FROM scores sc
+JOIN students st ON st.student_key = sc.student_key
+JOIN subjects s ON s.subject_key = sc.subject_key
+LEFT JOIN teachers t ON t.teacher_key = sc.teacher_key
+LEFT JOIN predictions p ON p.score_key = sc.score_key
+{where}
+"""
+
+CATEGORICAL_COLUMNS = ['student_name', 'class', 'gender', 'subject_name', 'teacher_name']
+
+
+def database_available(db_path):
+    """True when the database exists and has score rows to show."""
+    if not os.path.exists(db_path):
+        return False
+    try:
+        conn = connect_read(db_path)
+        try:
+            return conn.execute("SELECT EXISTS (SELECT 1 FROM scores)").fetchone()[0] == 1
+        finally:
+            conn.close()
+    except Exception:
+        return False
+
+
+def get_filter_options(db_path):
+    """Sorted subject names and classes for the sidebar filters."""
+    conn = connect_read(db_path)
+    try:
+        subjects = [name for name, in conn.execute("SELECT DISTINCT subject_name FROM subjects ORDER BY subject_name")]
+        classes = [name for name, in conn.execute("SELECT DISTINCT class FROM students ORDER BY class")]
+    finally:
+        conn.close()
+    return subjects, classes
+
+
+def query_scores(db_path, subjects=None, classes=None):
+    """Load score rows matching the filters; None means no filter on that column.
+
+    The filters become a parameterized WHERE clause, so SQLite uses the
+    subject and class indexes and only matching rows reach pandas.
+    """
+    clauses, params = [], []
+    if subjects is not None:
+        clauses.append(f"sc.subject_key IN (SELECT subject_key FROM subjects WHERE subject_name IN ({', '.join('?' * len(subjects))}))")
+        params.extend(subjects)
+    if classes is not None:
+        clauses.append(f"st.class IN ({', '.join('?' * len(classes))})")
+        params.extend(classes)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = connect_read(db_path)
+    try:
+        df = pd.read_sql_query(SCORES_QUERY.format(where=where), conn, params=params, parse_dates=['exam_date'])
+    finally:
+        conn.close()
+
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].fillna('Unknown').astype('category')
+    return df
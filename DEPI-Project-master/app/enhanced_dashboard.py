@@ -9,7 +9,17 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA
 import os
+import sys
 from styles import get_custom_css, card_component
+from data_source import database_available, get_filter_options, query_scores
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(PROJECT_ROOT, 'student_performance.db')
+FILTER_CACHE_ENTRIES = 4   # Filtered score tables kept in memory; each can be nearly the whole scores table
+FILTER_CACHE_TTL = 600     # Seconds a filtered table stays cached
+sys.path.append(PROJECT_ROOT)
+from database.connection import connect_read
+from database.watermarks import latest_batch
 
 # Configuration
 st.set_page_config(
@@ -33,20 +43,47 @@ def gradient_header(title, subtitle):
     """
 
 
+def get_data_version():
+    """Latest ingestion batch in the database (0 if unavailable)."""
+    if not os.path.exists(DB_PATH):
+        return 0
+    try:
+        conn = connect_read(DB_PATH)
+        try:
+            return latest_batch(conn)
+        finally:
+            conn.close()
+    except Exception:
+        return 0
+
+
+def read_snapshot(path):
+    """Read the typed Parquet snapshot: categorical IDs, numeric marks, datetime64 dates."""
+    import pyarrow.parquet as pq
+    return pq.read_table(path).to_pandas(date_as_object=False)
+
+
 @st.cache_data
-def load_data():
-    """Load data from CSV file with proper column mapping for the dashboard."""
-    # Get the directory of this script, then go up one level to project root
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    csv_path = os.path.join(project_root, 'data', 'raw_student_data.csv')
-    
-    if not os.path.exists(csv_path):
+def load_data(data_version=0):
+    """Load the exported score data with proper column mapping for the dashboard.
+
+    Prefers the Parquet snapshot written by db_manager (typed columns, no text
+    parsing) and falls back to the CSV when the snapshot is missing or older.
+    `data_version` is only part of the cache key: a newly ingested batch
+    invalidates the cached frame.
+    """
+    csv_path = os.path.join(PROJECT_ROOT, 'data', 'raw_student_data.csv')
+    snapshot_path = os.path.join(PROJECT_ROOT, 'data', 'raw_student_data.parquet')
+    use_snapshot = os.path.exists(snapshot_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(snapshot_path) >= os.path.getmtime(csv_path)
+    )
+    
+    if not use_snapshot and not os.path.exists(csv_path):
         st.error('❌ Data file not found: data/raw_student_data.csv')
         return pd.DataFrame()
     
     try:
-        df = pd.read_csv(csv_path)
+        df = read_snapshot(snapshot_path) if use_snapshot else pd.read_csv(csv_path)
         
         df = df.rename(columns={
             'student_id': 'student_name',
@@ -57,20 +94,21 @@ def load_data():
             'date': 'exam_date'
         })
         
-        if 'subject_name' in df.columns:
-            df['subject_name'] = df['subject_name'].apply(
-                lambda x: str(x).replace('SUB_', '').replace('_', ' ').title()[:20] if pd.notna(x) else 'Unknown'
-            )
-        
-        if 'student_name' in df.columns:
-            df['student_name'] = df['student_name'].apply(
-                lambda x: 'Student ' + str(x).replace('STU_', '').replace('_', '')[:10] if pd.notna(x) else 'Unknown'
-            )
-        
-        if 'teacher_name' in df.columns:
-            df['teacher_name'] = df['teacher_name'].apply(
-                lambda x: 'Teacher ' + str(x).replace('TCH_', '').replace('_', '')[:10] if pd.notna(x) else 'Unknown'
-            )
+        # IDs become categoricals: rows hold integer codes, so groupby/isin work on
+        # integers and display names are derived once per category, not per row
+        display_names = {
+            'subject_name': lambda x: str(x).replace('SUB_', '').replace('_', ' ').title()[:20],
+            'student_name': lambda x: 'Student ' + str(x).replace('STU_', '').replace('_', '')[:10],
+            'teacher_name': lambda x: 'Teacher ' + str(x).replace('TCH_', '').replace('_', '')[:10],
+        }
+        for col, to_display in display_names.items():
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+                if df[col].isna().any():
+                    df[col] = df[col].cat.add_categories('Unknown').fillna('Unknown')
+                df[col] = df[col].cat.rename_categories(
+                    lambda x: x if x == 'Unknown' else to_display(x)
+                )
         
         if 'class' not in df.columns:
             np.random.seed(42)
@@ -84,11 +122,17 @@ def load_data():
         if 'score_id' not in df.columns:
             df['score_id'] = range(1, len(df) + 1)
         
+        if 'student_key' not in df.columns:
+            df['student_key'] = df['student_name'].cat.codes
+        
+        # Already typed when read from the snapshot; only text columns need coercion
         for col in ['exam_1', 'exam_2', 'exam_3', 'total_attendance', 'total_mark']:
+            if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors='coerce')
             if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                df[col] = df[col].fillna(0)
         
-        if 'exam_date' in df.columns:
+        if 'exam_date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['exam_date']):
             df['exam_date'] = pd.to_datetime(df['exam_date'], errors='coerce')
         
         return df
@@ -98,8 +142,26 @@ def load_data():
         return pd.DataFrame()
 
 
-# Load data
-df = load_data()
+@st.cache_data
+def load_filter_options(data_version=0):
+    """Subject and class choices from the database (cached per data version)."""
+    return get_filter_options(DB_PATH)
+
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES, ttl=FILTER_CACHE_TTL)
+def load_filtered_data(subjects, classes, data_version=0):
+    """Rows matching the sidebar filters, filtered inside SQLite.
+
+    Only the last few filter combinations are kept, and only for a while:
+    a broad filter returns a near-full copy of the scores table.
+    """
+    return query_scores(DB_PATH, subjects, classes)
+
+
+# Load data: SQLite when available (filters pushed into SQL), else the exported files
+data_version = get_data_version()
+use_database = database_available(DB_PATH)
+df = None if use_database else load_data(data_version)
 
 # Sidebar Navigation with icons
 st.sidebar.title("🎯 Navigation")
@@ -117,37 +179,52 @@ page = page.split(" ", 1)[1]
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 🔍 Filters")
 
-# Validate data
-if df is None or df.empty:
-    st.error("❌ No data available. Please ensure data/raw_student_data.csv exists.")
-    st.stop()
+if use_database:
+    subject_options, class_options = load_filter_options(data_version)
+else:
+    # Validate data
+    if df is None or df.empty:
+        st.error("❌ No data available. Please ensure student_performance.db or data/raw_student_data.csv exists.")
+        st.stop()
 
-required_cols = {'subject_name', 'class', 'total_mark', 'total_attendance', 'student_name'}
-available_cols = set(df.columns)
-missing_cols = required_cols - available_cols
+    required_cols = {'subject_name', 'class', 'total_mark', 'total_attendance', 'student_name'}
+    available_cols = set(df.columns)
+    missing_cols = required_cols - available_cols
 
-if missing_cols:
-    st.error(f"❌ Missing required columns: {', '.join(sorted(missing_cols))}")
-    st.info(f"📋 Available columns: {', '.join(sorted(df.columns))}")
-    st.stop()
+    if missing_cols:
+        st.error(f"❌ Missing required columns: {', '.join(sorted(missing_cols))}")
+        st.info(f"📋 Available columns: {', '.join(sorted(df.columns))}")
+        st.stop()
+
+    subject_options = sorted(df['subject_name'].unique())
+    class_options = sorted(df['class'].unique())
 
 # Filters
 selected_subject = st.sidebar.multiselect(
     "📚 Select Subject", 
-    sorted(df['subject_name'].unique()), 
-    default=sorted(df['subject_name'].unique())[:5] if len(df['subject_name'].unique()) > 5 else sorted(df['subject_name'].unique())
+    subject_options, 
+    default=subject_options[:5] if len(subject_options) > 5 else subject_options
 )
 selected_class = st.sidebar.multiselect(
     "🎓 Select Class", 
-    sorted(df['class'].unique()), 
-    default=sorted(df['class'].unique())
+    class_options, 
+    default=class_options
 )
 
 # Filter Data
-if selected_subject and selected_class:
-    filtered_df = df[df['subject_name'].isin(selected_subject) & df['class'].isin(selected_class)]
+if use_database:
+    if selected_subject and selected_class:
+        filtered_df = load_filtered_data(tuple(selected_subject), tuple(selected_class), data_version)
+    else:
+        filtered_df = load_filtered_data(None, None, data_version)
 else:
-    filtered_df = df.copy()
+    if selected_subject and selected_class:
+        filtered_df = df[df['subject_name'].isin(selected_subject) & df['class'].isin(selected_class)].copy()
+    else:
+        filtered_df = df.copy()
+    # Drop filtered-out categories so groupbys only show selected subjects/students
+    for col in filtered_df.select_dtypes('category'):
+        filtered_df[col] = filtered_df[col].cat.remove_unused_categories()
 
 if filtered_df.empty:
     st.warning("⚠️ No data matches the selected filters. Please adjust your selection.")
@@ -195,7 +272,7 @@ if page == "Overview":
     
     avg_score = filtered_df['total_mark'].mean()
     avg_attendance = filtered_df['total_attendance'].mean()
-    total_students = filtered_df['student_name'].nunique()
+    total_students = filtered_df['student_key'].nunique()
     
     if not filtered_df.empty and 'total_mark' in filtered_df.columns:
         top_idx = filtered_df['total_mark'].idxmax()
@@ -468,6 +545,32 @@ elif page == "Predictive Analytics":
     else:
         st.warning("⚠️ Not enough data for clustering (need at least 10 records)")
 
+    # Stored model predictions (written by models/batch_score.py)
+    st.markdown("### 🤖 Model Predictions")
+
+    if 'predicted_mark' in filtered_df.columns and filtered_df['predicted_mark'].notna().any():
+        predicted = filtered_df.dropna(subset=['predicted_mark'])
+
+        col1, col2 = st.columns(2)
+        with col1:
+            fig_pred = px.scatter(
+                predicted, x='total_mark', y='predicted_mark', color='predicted_group',
+                title="🎯 Predicted vs Actual Mark", opacity=0.5
+            )
+            fig_pred = update_chart_layout(fig_pred)
+            st.plotly_chart(fig_pred, use_container_width=True)
+        with col2:
+            group_counts = predicted['predicted_group'].value_counts().reset_index()
+            group_counts.columns = ['Predicted Group', 'Exams']
+            fig_groups = px.bar(group_counts, x='Predicted Group', y='Exams', title="📊 Predicted Performance Groups")
+            fig_groups = update_chart_layout(fig_groups)
+            st.plotly_chart(fig_groups, use_container_width=True)
+
+        mae = (predicted['predicted_mark'] - predicted['total_mark']).abs().mean()
+        st.metric("Mean Absolute Error", f"{mae:.2f}")
+    else:
+        st.info("🤖 No stored predictions yet. Run `python models/batch_score.py` after training.")
+
 
 # ============== PAGE: RISK ANALYSIS ==============
 elif page == "Risk Analysis":
@@ -587,7 +690,9 @@ elif page == "Performance Benchmarking":
     # Top Performers
     st.markdown("### 🏅 Top Performers")
     
-    top_students = filtered_df.groupby('student_name')['total_mark'].mean().sort_values(ascending=False).head(10).reset_index()
+    # Group on the student key so namesakes are not merged
+    top_students = filtered_df.groupby(['student_key', 'student_name'], observed=True)['total_mark'].mean()
+    top_students = top_students.sort_values(ascending=False).head(10).reset_index().drop(columns='student_key')
     top_students.columns = ['Student', 'Avg Score']
     top_students['Rank'] = range(1, len(top_students) + 1)
     
@@ -608,7 +713,7 @@ elif page == "Performance Benchmarking":
     class_perf = filtered_df.groupby('class').agg({
         'total_mark': ['mean', 'std'],
         'total_attendance': 'mean',
-        'student_name': 'nunique'
+        'student_key': 'nunique'
     }).round(2)
     class_perf.columns = ['Avg Score', 'Std Dev', 'Avg Attendance', 'Students']
     class_perf = class_perf.reset_index()
@@ -0,0 +1,42 @@
+import numpy as np
+
+# Bit i of attendance_mask is set when lecture i + 1 was attended
+NUM_LECTURES = 10
+FULL_MASK = (1 << NUM_LECTURES) - 1
+
+# Popcount lookup for every possible mask; used when NumPy lacks bitwise_count (< 2.0)
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(FULL_MASK + 1)], dtype=np.uint8)
+
+
+def pack_lectures(lectures):
+    """Pack an (n, NUM_LECTURES) boolean attendance matrix into integer masks."""
+    weights = 1 << np.arange(lectures.shape[1], dtype=np.int64)
+    return (np.asarray(lectures, dtype=np.int64) * weights).sum(axis=1)
+
+
+def lecture_matrix(masks):
+    """Unpack masks into an (n, NUM_LECTURES) boolean matrix."""
+    masks = np.asarray(masks, dtype=np.int64)
+    return ((masks[:, None] >> np.arange(NUM_LECTURES)) & 1).astype(bool)
+
+
+def popcount(masks):
+    """Number of lectures attended per mask."""
+    masks = np.asarray(masks, dtype=np.int64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks)
+    return _POPCOUNT_TABLE[masks & FULL_MASK]
+
+
+def longest_absence_streak(masks):
+    """Longest run of consecutive missed lectures per mask.
+
+    Each `runs &= runs >> 1` step shortens every run of absence bits by one,
+    so the number of steps until a row reaches zero is its longest run.
+    """
+    runs = ~np.asarray(masks, dtype=np.int64) & FULL_MASK
+    streak = np.zeros(runs.shape, dtype=np.int64)
+    while runs.any():
+        streak += runs != 0
+        runs &= runs >> 1
+    return streak
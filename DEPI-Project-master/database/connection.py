@@ -0,0 +1,38 @@
+import sqlite3
+
+from database.sql_functions import register_functions
+
+# Configuration
+DB_PATH = 'student_performance.db'
+
+# Tuned for bulk loads and concurrent readers: WAL lets readers proceed while a
+# writer commits, NORMAL sync is durable in WAL mode, and mmap/cache keep hot
+# pages out of the read() path.
+CACHE_SIZE_KIB = 256 * 1024      # 256 MiB page cache (negative PRAGMA value = KiB)
+MMAP_SIZE = 1024 ** 3            # 1 GiB memory-mapped I/O
+BUSY_TIMEOUT_MS = 30_000         # Wait for a competing writer instead of failing
+
+
+def _apply_pragmas(conn):
+    """Apply the per-connection performance PRAGMAs and register SQL functions."""
+    register_functions(conn)
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def connect_write(db_path=DB_PATH):
+    """Open a read-write connection, switching the database to WAL mode."""
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    # journal_mode is persistent: once set, readers see a WAL database too
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return _apply_pragmas(conn)
+
+
+def connect_read(db_path=DB_PATH):
+    """Open a read-only connection; it never takes a write lock."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+    return _apply_pragmas(conn)
@@ -1,147 +1,568 @@
 import sqlite3
-import pandas as pd
-import random
-from faker import Faker
+import argparse
+import csv
+import importlib.util
+import numpy as np
 import os
-from datetime import datetime, timedelta
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
 
-# Initialize Faker
-fake = Faker()
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_read, connect_write
+from database.attendance import NUM_LECTURES, pack_lectures, lecture_matrix, popcount
+from database.watermarks import start_batch
+from database.rollups import set_rollups_enabled, rebuild_rollups
 
 # Configuration
 DB_PATH = 'student_performance.db'
 SCHEMA_PATH = 'database/schema.sql'
+MIGRATIONS_DIR = 'database/migrations'
 RAW_DATA_PATH = 'data/raw_student_data.csv'
+SNAPSHOT_PATH = 'data/raw_student_data.parquet'
+
+SUBJECTS = ['Mathematics', 'Physics', 'Chemistry', 'Biology', 'History', 'English', 'Computer Science', 'Art']
+NAME_POOL_SIZE = 1000      # Faker names are sampled once, rows draw from the pool
+SHARD_SIZE = 50_000        # Students per shard; fixed so output never depends on worker count
+EXPORT_CHUNK_SIZE = 100_000  # Rows fetched and written per CSV chunk
+INGEST_CHUNK_SIZE = 50_000   # Rows parsed and staged per executemany during ingest
+
+# CSV column -> source column; integer keys are mapped back to external IDs on export
+EXPORT_COLUMNS = {
+    'student_id': 'st.student_id',
+    'subject_id': 's.subject_id',
+    'teacher_id': 't.teacher_id',
+    'exam_1': 'sc.exam_1',
+    'exam_2': 'sc.exam_2',
+    'exam_3': 'sc.exam_3',
+    'attendance': 'sc.total_attendance',
+    'final_score': 'sc.total_mark',
+    'date': 'sc.exam_date',
+}
+
+def apply_migrations(conn):
+    """Run pending migration scripts in version order, each in its own transaction.
+
+    Scripts are named NNNN_description.sql; the applied versions are recorded
+    in schema_version, so existing databases are upgraded in place. A
+    NNNN_description.py migration builds its script in Python (e.g. trigger
+    DDL generated by database/rollups.py) and exposes it as SCRIPT.
+    """
+    current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith(('.sql', '.py')):
+            continue
+        version = int(filename.split('_', 1)[0])
+        if version <= current:
+            continue
+
+        print(f"Applying migration {filename}...")
+        path = os.path.join(MIGRATIONS_DIR, filename)
+        if filename.endswith('.py'):
+            spec = importlib.util.spec_from_file_location(f'migration_{version:04d}', path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            script = module.SCRIPT
+        else:
+            with open(path, 'r') as f:
+                script = f.read()
+        try:
+            conn.executescript(f"BEGIN;\n{script}\n")
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, filename))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
 
 def init_db():
-    """Initialize the database with the schema."""
+    """Initialize the database with the schema and apply pending migrations."""
     print("Initializing database...")
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_write(DB_PATH)
     cursor = conn.cursor()
-    
+
     with open(SCHEMA_PATH, 'r') as f:
         schema = f.read()
         cursor.executescript(schema)
-    
+
     conn.commit()
+    apply_migrations(conn)
     conn.close()
     print("Database initialized.")
 
-def generate_data():
-    """Generate synthetic data and populate the database."""
-    print("Generating data...")
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def _hex_ids(prefix, index, salt):
+    """Map sequence numbers to unique, random-looking IDs such as STU_5d85338c.
 
-    # 1. Generate Subjects
-    subjects = ['Mathematics', 'Physics', 'Chemistry', 'Biology', 'History', 'English', 'Computer Science', 'Art']
-    subject_ids = []
-    for sub in subjects:
-        sub_id = f"SUB_{sub[:3].upper()}_{random.randint(100, 999)}"
-        cursor.execute("INSERT OR IGNORE INTO subjects (subject_id, subject_name) VALUES (?, ?)", (sub_id, sub))
-        subject_ids.append(sub_id)
-    
-    # 2. Generate Teachers
-    teacher_ids = []
-    for _ in range(10):
-        t_id = f"TCH_{fake.uuid4()[:8]}"
-        cursor.execute("""
-            INSERT INTO teachers (teacher_id, first_name, last_name, gender, subject, date_of_employment, phone_number)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            t_id,
-            fake.first_name(),
-            fake.last_name(),
-            random.choice(['Male', 'Female']),
-            random.choice(subjects),
-            fake.date_between(start_date='-10y', end_date='today'),
-            fake.phone_number()
-        ))
-        teacher_ids.append(t_id)
-
-    # 3. Generate Students
-    student_ids = []
-    for _ in range(500):
-        s_id = f"STU_{fake.uuid4()[:8]}"
-        cursor.execute("""
-            INSERT INTO students (student_id, first_name, last_name, gender, class, date_of_birth)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            s_id,
-            fake.first_name(),
-            fake.last_name(),
-            random.choice(['Male', 'Female']),
-            f"Class {random.randint(10, 12)}",
-            fake.date_of_birth(minimum_age=15, maximum_age=18)
-        ))
-        student_ids.append(s_id)
-
-    # 4. Generate Scores
-    # Each student takes 3-5 subjects
-    score_data = []
-    
-    for s_id in student_ids:
-        num_subjects = random.randint(3, 5)
-        chosen_subjects = random.sample(subject_ids, num_subjects)
-        
-        for sub_id in chosen_subjects:
-            score_id = f"SCR_{fake.uuid4()[:8]}"
-            t_id = random.choice(teacher_ids) # Assign random teacher for now
-            
-            # Generate exam scores
-            exam_1 = round(random.uniform(50, 100), 2)
-            exam_2 = round(random.uniform(50, 100), 2)
-            exam_3 = round(random.uniform(50, 100), 2)
-            
-            # Generate attendance (lectures)
-            lectures = [random.choice([True, False]) for _ in range(10)]
-            # Bias towards True for better realistic data
-            lectures = [random.random() > 0.2 for _ in range(10)] 
-            
-            total_attendance = sum(lectures)
-            
-            # Calculate total mark (simple average for now)
-            total_mark = round((exam_1 + exam_2 + exam_3) / 3, 2)
-
-            cursor.execute("""
-                INSERT INTO scores (
-                    score_id, student_id, teacher_id, subject_id, 
-                    exam_1, exam_2, exam_3, 
-                    lecture_1, lecture_2, lecture_3, lecture_4, lecture_5, 
-                    lecture_6, lecture_7, lecture_8, lecture_9, lecture_10, 
-                    total_attendance, total_mark,
-                    exam_date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                score_id, s_id, t_id, sub_id,
-                exam_1, exam_2, exam_3,
-                *lectures,
-                total_attendance, total_mark,
-                fake.date_between(start_date='-2y', end_date='today')
-            ))
-            
-            # Collect data for CSV export
-            score_data.append({
-                'student_id': s_id,
-                'subject_id': sub_id,
-                'teacher_id': t_id,
-                'exam_1': exam_1,
-                'exam_2': exam_2,
-                'exam_3': exam_3,
-                'attendance': total_attendance,
-                'final_score': total_mark,
-                'date': fake.date_this_year()
-            })
+    Multiplying by an odd constant modulo 2**32 and XOR-ing a salt are both
+    bijections, so distinct indexes never collide.
+    """
+    scrambled = ((index.astype(np.uint64) * np.uint64(0x9E3779B1)) & np.uint64(0xFFFFFFFF)) ^ np.uint64(salt)
+    return [f"{prefix}{value:08x}" for value in scrambled.tolist()]
+
+def _random_dates(rng, end, min_days, max_days, size):
+    """Draw ISO dates between `max_days` and `min_days` days before `end`."""
+    offsets = rng.integers(min_days, max_days + 1, size=size)
+    dates = np.datetime64(end, 'D') - offsets.astype('timedelta64[D]')
+    return np.datetime_as_string(dates, unit='D').tolist()
+
+def _name_pools(seed):
+    """Pre-sample Faker names and phone numbers so rows never call Faker."""
+    # Imported here so migrate/ingest/export do not pay Faker's startup cost
+    from faker import Faker
+    Faker.seed(seed)
+    fake = Faker()
+    return {
+        'first_name': np.array([fake.first_name() for _ in range(NAME_POOL_SIZE)]),
+        'last_name': np.array([fake.last_name() for _ in range(NAME_POOL_SIZE)]),
+        'phone_number': np.array([fake.phone_number() for _ in range(NAME_POOL_SIZE)]),
+    }
+
+def _pick(rng, pool, size):
+    return pool[rng.integers(0, len(pool), size=size)].tolist()
+
+def _generate_block(rng, start, stop, num_subjects, num_teachers, pools, salts, today):
+    """Generate the students in [start, stop) and all of their scores as column arrays.
+
+    Students, teachers and subjects are keyed by index + 1, matching the
+    INTEGER PRIMARY KEYs assigned when they are inserted into empty tables.
+    """
+    n = stop - start
+    students = {
+        'student_key': np.arange(start + 1, stop + 1).tolist(),
+        'student_id': _hex_ids('STU_', np.arange(start, stop), salts['student']),
+        'first_name': _pick(rng, pools['first_name'], n),
+        'last_name': _pick(rng, pools['last_name'], n),
+        'gender': _pick(rng, np.array(['Male', 'Female']), n),
+        'class': [f"Class {c}" for c in rng.integers(10, 13, size=n).tolist()],
+        'date_of_birth': _random_dates(rng, today, 15 * 365, 19 * 365 - 1, n),
+    }
+
+    # Each student takes 3-5 distinct subjects: shuffle subject positions per row, keep the first k
+    num_taken = rng.integers(3, 6, size=n)
+    order = rng.random((n, num_subjects)).argsort(axis=1)
+    chosen = np.arange(num_subjects) < num_taken[:, None]
+    owner = np.repeat(np.arange(n), num_taken)
+    subject_idx = order[chosen]
+    n_scores = len(owner)
+
+    exams = rng.uniform(50, 100, size=(n_scores, 3)).round(2)
+    # Bias towards True for better realistic data
+    lectures = rng.random((n_scores, NUM_LECTURES)) > 0.2
 
+    scores = {
+        # Score IDs derive from (student, subject) so they are unique without coordination
+        'score_id': _hex_ids('SCR_', (start + owner) * num_subjects + subject_idx, salts['score']),
+        'student_key': (start + owner + 1).tolist(),
+        'teacher_key': rng.integers(1, num_teachers + 1, size=n_scores).tolist(),
+        'subject_key': (subject_idx + 1).tolist(),
+        'exam_1': exams[:, 0].tolist(),
+        'exam_2': exams[:, 1].tolist(),
+        'exam_3': exams[:, 2].tolist(),
+    }
+    for i in range(NUM_LECTURES):
+        scores[f'lecture_{i + 1}'] = lectures[:, i].astype(int).tolist()
+    scores['attendance_mask'] = pack_lectures(lectures).tolist()
+    scores['total_attendance'] = lectures.sum(axis=1).tolist()
+    # Calculate total mark (simple average for now)
+    scores['total_mark'] = (exams.sum(axis=1) / 3).round(2).tolist()
+    scores['exam_date'] = _random_dates(rng, today, 0, 2 * 365, n_scores)
+    return students, scores
+
+def _insert_columns(cursor, table, columns):
+    """Bulk insert a dict of equal-length column lists with a single executemany."""
+    names = list(columns)
+    placeholders = ', '.join('?' * len(names))
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})",
+        zip(*columns.values())
+    )
+
+def _table_ddl(conn, tables):
+    """CREATE TABLE statements for `tables` as they exist in the (migrated) database."""
+    placeholders = ', '.join('?' * len(tables))
+    rows = conn.execute(
+        f"SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})", tables
+    ).fetchall()
+    return ';\n'.join(sql for sql, in rows) + ';'
+
+def _generate_shard(task):
+    """Worker: generate one student-ID shard into its own temporary SQLite file."""
+    shard_path, seed_seq, start, stop, num_subjects, num_teachers, pools, salts, today, ddl = task
+    rng = np.random.default_rng(seed_seq)
+    students, scores = _generate_block(rng, start, stop, num_subjects, num_teachers, pools, salts, today)
+
+    # Shards are throwaway files, so skip journaling entirely
+    conn = sqlite3.connect(shard_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    # Same column layout as the main tables, but without indexes to maintain
+    conn.executescript(ddl)
+    cursor = conn.cursor()
+    _insert_columns(cursor, 'students', students)
+    _insert_columns(cursor, 'scores', scores)
     conn.commit()
     conn.close()
+    return shard_path, stop, len(scores['score_id'])
+
+def _merge_shard(conn, shard_path, batch_id):
+    """Append a shard's students and scores to the main database.
+
+    Student keys come from the generator; score keys are left to SQLite so
+    they stay dense and follow merge order. Scores are stamped with `batch_id`.
+    """
+    conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+    score_columns = [
+        name for _, name, *_ in conn.execute("PRAGMA main.table_info(scores)") if name != 'score_key'
+    ]
+    select_list = ', '.join('?' if name == 'batch_id' else name for name in score_columns)
+    conn.execute("INSERT INTO students SELECT * FROM shard.students ORDER BY rowid")
+    conn.execute(
+        f"INSERT INTO scores ({', '.join(score_columns)}) SELECT {select_list} FROM shard.scores ORDER BY rowid",
+        (batch_id,)
+    )
+    conn.commit()
+    conn.execute("DETACH DATABASE shard")
+    os.remove(shard_path)
+
+def generate_data(num_students=500, num_teachers=10, seed=None, workers=None):
+    """Generate synthetic data and populate the database.
+
+    All random values are drawn as NumPy arrays. Students are split into
+    fixed-size shards, each generated in a worker process with its own
+    seed spawned from the global seed, written to a temporary SQLite file
+    and merged back in shard order with ATTACH + INSERT ... SELECT. The same
+    seed therefore reproduces the same database for any number of workers.
+    Existing rows are replaced.
+    """
+    workers = workers or os.cpu_count() or 1
+    num_shards = -(-num_students // SHARD_SIZE)
+    print(f"Generating data for {num_students} students and {num_teachers} teachers "
+          f"({num_shards} shards, {workers} workers)...")
+    seed_seq = np.random.SeedSequence(seed)
+    root_seq, = seed_seq.spawn(1)
+    shard_seqs = seed_seq.spawn(num_shards)
+    rng = np.random.default_rng(root_seq)
+    pools = _name_pools(seed)
+    salts = {name: int(rng.integers(0, 2**32)) for name in ('teacher', 'student', 'score')}
+    today = date.today().isoformat()
+
+    conn = connect_write(DB_PATH)
+    cursor = conn.cursor()
+    # Per-row rollup triggers would dominate the bulk delete and load; rebuild them once at the end
+    set_rollups_enabled(conn, False)
+    for table in ('predictions', 'scores', 'students', 'teachers', 'subjects', 'stage_watermarks', 'ingestion_batches'):
+        cursor.execute(f"DELETE FROM {table}")
+    batch_id = start_batch(conn, f"generate students={num_students} teachers={num_teachers} seed={seed}")
+
+    try:
+        # 1. Generate Subjects
+        subject_ids = [f"SUB_{sub[:3].upper()}_{code}" for sub, code in zip(SUBJECTS, rng.integers(100, 1000, size=len(SUBJECTS)).tolist())]
+        _insert_columns(cursor, 'subjects', {
+            'subject_key': list(range(1, len(SUBJECTS) + 1)),
+            'subject_id': subject_ids,
+            'subject_name': SUBJECTS,
+        })
+
+        # 2. Generate Teachers
+        _insert_columns(cursor, 'teachers', {
+            'teacher_key': list(range(1, num_teachers + 1)),
+            'teacher_id': _hex_ids('TCH_', np.arange(num_teachers), salts['teacher']),
+            'first_name': _pick(rng, pools['first_name'], num_teachers),
+            'last_name': _pick(rng, pools['last_name'], num_teachers),
+            'gender': _pick(rng, np.array(['Male', 'Female']), num_teachers),
+            'subject': _pick(rng, np.array(SUBJECTS), num_teachers),
+            'date_of_employment': _random_dates(rng, today, 0, 10 * 365, num_teachers),
+            'phone_number': _pick(rng, pools['phone_number'], num_teachers),
+        })
+        conn.commit()
+
+        # 3. Generate Students and Scores shard by shard, merging in shard order
+        ddl = _table_ddl(conn, ('students', 'scores'))
+        with tempfile.TemporaryDirectory(prefix='student_shards_') as shard_dir:
+            tasks = [
+                (os.path.join(shard_dir, f'shard_{i:05d}.db'), shard_seqs[i],
+                 i * SHARD_SIZE, min((i + 1) * SHARD_SIZE, num_students),
+                 len(SUBJECTS), num_teachers, pools, salts, today, ddl)
+                for i in range(num_shards)
+            ]
+            total_scores = 0
+            if workers == 1:
+                results = map(_generate_shard, tasks)
+                executor = None
+            else:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                results = executor.map(_generate_shard, tasks)
+            try:
+                for shard_path, stop, n_scores in results:
+                    _merge_shard(conn, shard_path, batch_id)
+                    total_scores += n_scores
+                    print(f"  {stop}/{num_students} students, {total_scores} scores")
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+
+        conn.execute("UPDATE ingestion_batches SET row_count = ? WHERE batch_id = ?", (total_scores, batch_id))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        # Shards merged so far are committed; leave rollups matching them and the triggers on
+        print("Rebuilding rollups...")
+        rebuild_rollups(conn)
+        set_rollups_enabled(conn, True)
+        conn.commit()
+        conn.close()
     print("Data generation complete.")
-    
-    # Export to CSV
-    df = pd.DataFrame(score_data)
-    df.to_csv(RAW_DATA_PATH, index=False)
-    print(f"Raw data exported to {RAW_DATA_PATH}")
+
+EXPORT_QUERY = """
+    SELECT {columns}
+    FROM scores sc
+    JOIN students st ON st.student_key = sc.student_key
+    JOIN subjects s ON s.subject_key = sc.subject_key
+    JOIN teachers t ON t.teacher_key = sc.teacher_key
+    ORDER BY sc.score_key
+"""
+
+def export_csv(path=RAW_DATA_PATH, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream the scores table to CSV in fixed-size chunks.
+
+    Rows go straight from the SQLite cursor to the file, so memory stays
+    bounded by `chunk_size` regardless of table size.
+    """
+    print(f"Exporting raw data to {path}...")
+    conn = connect_read(DB_PATH)
+    cursor = conn.cursor()
+    columns = ', '.join(f"{src} AS {dst}" for dst, src in EXPORT_COLUMNS.items())
+    cursor.execute(EXPORT_QUERY.format(columns=columns))
+
+    total = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            total += len(rows)
+
+    conn.close()
+    print(f"Raw data exported to {path} ({total} rows)")
+
+def export_snapshot(path=SNAPSHOT_PATH, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the CSV columns as a typed, columnar Parquet snapshot.
+
+    IDs and subjects are dictionary-encoded (categoricals when loaded with
+    pandas), marks are float64, attendance int8 and dates date32. Chunks are
+    written as row groups, so memory stays bounded like export_csv. Requires
+    pyarrow; without it the snapshot is skipped.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed; skipping Parquet snapshot.")
+        return
+
+    print(f"Writing Parquet snapshot to {path}...")
+    schema = pa.schema([
+        ('student_id', pa.dictionary(pa.int32(), pa.string())),
+        ('subject_id', pa.dictionary(pa.int32(), pa.string())),
+        ('teacher_id', pa.dictionary(pa.int32(), pa.string())),
+        ('exam_1', pa.float64()),
+        ('exam_2', pa.float64()),
+        ('exam_3', pa.float64()),
+        ('attendance', pa.int8()),
+        ('final_score', pa.float64()),
+        ('date', pa.date32()),
+    ])
+    conn = connect_read(DB_PATH)
+    cursor = conn.cursor()
+    columns = ', '.join(f"{src} AS {dst}" for dst, src in EXPORT_COLUMNS.items())
+    cursor.execute(EXPORT_QUERY.format(columns=columns))
+
+    total = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            arrays = [
+                pa.array(values).cast(field.type) if not pa.types.is_dictionary(field.type)
+                else pa.array(values, pa.string()).dictionary_encode()
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            total += len(rows)
+
+    conn.close()
+    print(f"Parquet snapshot written to {path} ({total} rows)")
+
+# Staging layout for ingest(); student detail columns are optional in the input
+STAGING_COLUMNS = [
+    'score_id', 'student_id', 'first_name', 'last_name', 'gender', 'class', 'date_of_birth',
+    'teacher_id', 'subject_id', 'exam_1', 'exam_2', 'exam_3',
+    *[f'lecture_{i}' for i in range(1, NUM_LECTURES + 1)],
+    'attendance_mask', 'total_attendance', 'total_mark', 'exam_date',
+]
+REQUIRED_INGEST_COLUMNS = {'score_id', 'student_id', 'teacher_id', 'subject_id', 'exam_1', 'exam_2', 'exam_3', 'exam_date'}
+
+def _read_batch(path, chunk_size):
+    """Yield DataFrame chunks from a CSV or JSONL (one JSON object per line) file."""
+    import pandas as pd
+    if path.endswith(('.jsonl', '.ndjson', '.json')):
+        return pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    return pd.read_csv(path, chunksize=chunk_size, dtype={'score_id': str, 'student_id': str})
+
+def _normalize_chunk(df):
+    """Fill derived columns (attendance mask/lectures, totals) and order columns for staging."""
+    import pandas as pd
+    missing = REQUIRED_INGEST_COLUMNS - set(df.columns)
+    if missing:
+        raise ValueError(f"Ingest batch is missing required columns: {', '.join(sorted(missing))}")
+
+    # Attendance may come as lecture_N flags or as a mask; rows with any flag use the flags
+    lecture_cols = [f'lecture_{i}' for i in range(1, NUM_LECTURES + 1)]
+    mask = pd.to_numeric(df.get('attendance_mask', pd.Series(np.nan, index=df.index)))
+    if set(lecture_cols) <= set(df.columns):
+        has_lectures = df[lecture_cols].notna().any(axis=1)
+        packed = pack_lectures(df[lecture_cols].fillna(0).astype(bool).to_numpy())
+        mask = mask.where(~has_lectures, packed)
+    if mask.isna().any():
+        raise ValueError("Every ingested row needs either lecture_1..lecture_10 or attendance_mask")
+    df['attendance_mask'] = mask.astype(np.int64)
+    lectures = lecture_matrix(df['attendance_mask'].to_numpy())
+    for i, col in enumerate(lecture_cols):
+        df[col] = lectures[:, i].astype(int)
+    df['total_attendance'] = popcount(df['attendance_mask'].to_numpy())
+    average = ((df['exam_1'] + df['exam_2'] + df['exam_3']) / 3).round(2)
+    df['total_mark'] = df['total_mark'].fillna(average) if 'total_mark' in df.columns else average
+    df['exam_date'] = pd.to_datetime(df['exam_date']).dt.strftime('%Y-%m-%d')
+
+    df = df.reindex(columns=STAGING_COLUMNS)
+    # sqlite3 needs plain Python values: object dtype turns NaN into None
+    return df.astype(object).where(df.notna(), None)
+
+def ingest(path, chunk_size=INGEST_CHUNK_SIZE):
+    """Upsert a batch of exam results (CSV or JSONL) without regenerating the database.
+
+    Rows are staged with executemany into a temporary table, then students and
+    scores are upserted with one INSERT ... SELECT each, all in one transaction.
+    Teachers and subjects must already exist. Every inserted or updated score
+    is stamped with the new batch ID, which is the watermark downstream stages
+    compare against. Returns the batch ID.
+    """
+    print(f"Ingesting {path}...")
+    conn = connect_write(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE TEMP TABLE ingest_staging ({', '.join(STAGING_COLUMNS)})")
+    insert_staging = f"INSERT INTO ingest_staging VALUES ({', '.join('?' * len(STAGING_COLUMNS))})"
+
+    try:
+        staged = 0
+        for chunk in _read_batch(path, chunk_size):
+            chunk = _normalize_chunk(chunk)
+            cursor.executemany(insert_staging, chunk.itertuples(index=False, name=None))
+            staged += len(chunk)
+
+        unknown = cursor.execute("""
+            SELECT DISTINCT 'teacher ' || g.teacher_id FROM ingest_staging g
+            WHERE NOT EXISTS (SELECT 1 FROM teachers t WHERE t.teacher_id = g.teacher_id)
+            UNION ALL
+            SELECT DISTINCT 'subject ' || g.subject_id FROM ingest_staging g
+            WHERE NOT EXISTS (SELECT 1 FROM subjects s WHERE s.subject_id = g.subject_id)
+        """).fetchall()
+        if unknown:
+            raise ValueError(f"Unknown references in batch: {', '.join(u for u, in unknown[:10])}")
+
+        batch_id = start_batch(conn, os.path.basename(path), staged)
+
+        # Students: new IDs are inserted, known ones keep any detail the batch leaves empty
+        cursor.execute("""
+            INSERT INTO students (student_id, first_name, last_name, gender, class, date_of_birth)
+            SELECT student_id, MAX(first_name), MAX(last_name), MAX(gender), MAX(class), MAX(date_of_birth)
+            FROM ingest_staging
+            GROUP BY student_id
+            ON CONFLICT(student_id) DO UPDATE SET
+                first_name = COALESCE(excluded.first_name, first_name),
+                last_name = COALESCE(excluded.last_name, last_name),
+                gender = COALESCE(excluded.gender, gender),
+                class = COALESCE(excluded.class, class),
+                date_of_birth = COALESCE(excluded.date_of_birth, date_of_birth)
+        """)
+
+        score_columns = ['exam_1', 'exam_2', 'exam_3',
+                         *[f'lecture_{i}' for i in range(1, NUM_LECTURES + 1)],
+                         'attendance_mask', 'total_attendance', 'total_mark', 'exam_date']
+        cursor.execute(f"""
+            INSERT INTO scores (score_id, student_key, teacher_key, subject_key, {', '.join(score_columns)}, batch_id)
+            SELECT g.score_id, st.student_key, t.teacher_key, s.subject_key,
+                   {', '.join('g.' + c for c in score_columns)}, ?
+            FROM ingest_staging g
+            JOIN students st ON st.student_id = g.student_id
+            JOIN teachers t ON t.teacher_id = g.teacher_id
+            JOIN subjects s ON s.subject_id = g.subject_id
+            WHERE true
+            ON CONFLICT(score_id) DO UPDATE SET
+                student_key = excluded.student_key,
+                teacher_key = excluded.teacher_key,
+                subject_key = excluded.subject_key,
+                {', '.join(f'{c} = excluded.{c}' for c in score_columns)},
+                batch_id = excluded.batch_id
+        """, (batch_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"Ingested {staged} rows as batch {batch_id}.")
+    return batch_id
 
 if __name__ == "__main__":
-    init_db()
-    generate_data()
+    parser = argparse.ArgumentParser(description="Manage the student performance database.")
+    subparsers = parser.add_subparsers(dest='command')
+    # Running without a subcommand keeps the original behaviour: init + generate + export
+    parser.set_defaults(command='generate', students=500, teachers=10, seed=None, workers=None,
+                        chunk_size=EXPORT_CHUNK_SIZE, output=RAW_DATA_PATH, snapshot=SNAPSHOT_PATH, no_snapshot=False)
+
+    gen_parser = subparsers.add_parser('generate', help="Initialize the database, generate synthetic data and export it (default)")
+    gen_parser.add_argument('--students', type=int, default=500, help="Number of students to generate")
+    gen_parser.add_argument('--teachers', type=int, default=10, help="Number of teachers to generate")
+    gen_parser.add_argument('--seed', type=int, default=None, help="Random seed for a reproducible dataset")
+    gen_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+
+    subparsers.add_parser('migrate', help="Create missing tables and apply pending migrations in place")
+
+    ingest_parser = subparsers.add_parser('ingest', help="Upsert a CSV/JSONL batch of exam results into the existing database")
+    ingest_parser.add_argument('path', help="CSV or JSONL file with one score per row")
+    ingest_parser.add_argument('--chunk-size', type=int, default=INGEST_CHUNK_SIZE, help="Rows staged per executemany")
+    ingest_parser.add_argument('--export', action='store_true', help="Re-export the raw CSV after ingesting")
+
+    export_parser = subparsers.add_parser('export', help="Re-export the scores table to CSV without regenerating")
+    export_parser.add_argument('--output', default=RAW_DATA_PATH, help="CSV file to write")
+    export_parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help="Rows written per chunk")
+    export_parser.add_argument('--snapshot', default=SNAPSHOT_PATH, help="Parquet snapshot to write next to the CSV")
+    export_parser.add_argument('--no-snapshot', action='store_true', help="Only write the CSV")
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        init_db()
+        generate_data(num_students=args.students, num_teachers=args.teachers, seed=args.seed, workers=args.workers)
+        export_csv()
+        export_snapshot()
+    elif args.command == 'migrate':
+        init_db()
+    elif args.command == 'ingest':
+        init_db()
+        ingest(args.path, chunk_size=args.chunk_size)
+        if args.export:
+            export_csv()
+            export_snapshot()
+    elif args.command == 'export':
+        export_csv(path=args.output, chunk_size=args.chunk_size)
+        if not args.no_snapshot:
+            export_snapshot(path=args.snapshot, chunk_size=args.chunk_size)
@@ -0,0 +1,19 @@
+-- Migration 0001: Indexes for the scores joins and correlated subqueries
+-- Every insight query joins scores to students/teachers/subjects and recomputes
+-- per-class, per-subject, per-teacher or per-month averages. Trailing columns
+-- make each index covering for those averages, so they never touch the table.
+
+-- Joins to students and the class-average attendance subquery (1.1)
+CREATE INDEX IF NOT EXISTS idx_scores_student ON scores (student_id, total_attendance);
+CREATE INDEX IF NOT EXISTS idx_students_class ON students (class, student_id);
+
+-- Subject average for teacher value added (3.2)
+CREATE INDEX IF NOT EXISTS idx_scores_subject_mark ON scores (subject_id, total_mark);
+
+-- Teacher deviation and at-risk analysis (3.1, 3.3)
+CREATE INDEX IF NOT EXISTS idx_scores_teacher_mark ON scores (teacher_id, total_mark);
+
+-- Monthly aggregates (1.2, 2.1); must match the strftime() expression used in queries
+CREATE INDEX IF NOT EXISTS idx_scores_exam_month ON scores (strftime('%Y-%m', exam_date), total_mark, total_attendance);
+
+ANALYZE;
@@ -0,0 +1,17 @@
+-- Migration 0002: Bit-packed attendance
+-- Bit i of attendance_mask is set when lecture_(i + 1) was attended. The
+-- lecture_N columns are kept for compatibility; new code should read the mask.
+
+ALTER TABLE scores ADD COLUMN attendance_mask INTEGER;
+
+UPDATE scores SET attendance_mask =
+      (lecture_1 <> 0)
+    | ((lecture_2 <> 0) << 1)
+    | ((lecture_3 <> 0) << 2)
+    | ((lecture_4 <> 0) << 3)
+    | ((lecture_5 <> 0) << 4)
+    | ((lecture_6 <> 0) << 5)
+    | ((lecture_7 <> 0) << 6)
+    | ((lecture_8 <> 0) << 7)
+    | ((lecture_9 <> 0) << 8)
+    | ((lecture_10 <> 0) << 9);
@@ -0,0 +1,101 @@
+-- Migration 0003: Integer surrogate keys
+-- Every table gets an INTEGER PRIMARY KEY (a rowid alias) and keeps its
+-- external text ID (STU_..., TCH_..., SUB_..., SCR_...) as a UNIQUE lookup
+-- column. scores references the other tables by integer key only, so joins
+-- compare integers and score rows no longer carry three text IDs each.
+
+CREATE TABLE teachers_new (
+    teacher_key INTEGER PRIMARY KEY,
+    teacher_id VARCHAR(50) NOT NULL UNIQUE,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    gender VARCHAR(10),
+    subject VARCHAR(50),
+    date_of_employment DATE,
+    phone_number VARCHAR(20)
+);
+INSERT INTO teachers_new (teacher_id, first_name, last_name, gender, subject, date_of_employment, phone_number)
+SELECT teacher_id, first_name, last_name, gender, subject, date_of_employment, phone_number
+FROM teachers ORDER BY rowid;
+
+CREATE TABLE subjects_new (
+    subject_key INTEGER PRIMARY KEY,
+    subject_id VARCHAR(50) NOT NULL UNIQUE,
+    subject_name VARCHAR(100)
+);
+INSERT INTO subjects_new (subject_id, subject_name)
+SELECT subject_id, subject_name FROM subjects ORDER BY rowid;
+
+CREATE TABLE students_new (
+    student_key INTEGER PRIMARY KEY,
+    student_id VARCHAR(50) NOT NULL UNIQUE,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    gender VARCHAR(10),
+    class VARCHAR(20),
+    date_of_birth DATE
+);
+INSERT INTO students_new (student_id, first_name, last_name, gender, class, date_of_birth)
+SELECT student_id, first_name, last_name, gender, class, date_of_birth
+FROM students ORDER BY rowid;
+
+CREATE TABLE scores_new (
+    score_key INTEGER PRIMARY KEY,
+    score_id VARCHAR(50) NOT NULL UNIQUE,
+    student_key INTEGER REFERENCES students(student_key),
+    teacher_key INTEGER REFERENCES teachers(teacher_key),
+    subject_key INTEGER REFERENCES subjects(subject_key),
+    exam_1 FLOAT,
+    exam_2 FLOAT,
+    exam_3 FLOAT,
+    lecture_1 BOOLEAN,
+    lecture_2 BOOLEAN,
+    lecture_3 BOOLEAN,
+    lecture_4 BOOLEAN,
+    lecture_5 BOOLEAN,
+    lecture_6 BOOLEAN,
+    lecture_7 BOOLEAN,
+    lecture_8 BOOLEAN,
+    lecture_9 BOOLEAN,
+    lecture_10 BOOLEAN,
+    total_attendance INTEGER,
+    total_mark FLOAT,
+    exam_date DATE,
+    attendance_mask INTEGER
+);
+INSERT INTO scores_new (
+    score_id, student_key, teacher_key, subject_key,
+    exam_1, exam_2, exam_3,
+    lecture_1, lecture_2, lecture_3, lecture_4, lecture_5,
+    lecture_6, lecture_7, lecture_8, lecture_9, lecture_10,
+    total_attendance, total_mark, exam_date, attendance_mask
+)
+SELECT
+    sc.score_id, st.student_key, t.teacher_key, s.subject_key,
+    sc.exam_1, sc.exam_2, sc.exam_3,
+    sc.lecture_1, sc.lecture_2, sc.lecture_3, sc.lecture_4, sc.lecture_5,
+    sc.lecture_6, sc.lecture_7, sc.lecture_8, sc.lecture_9, sc.lecture_10,
+    sc.total_attendance, sc.total_mark, sc.exam_date, sc.attendance_mask
+FROM scores sc
+LEFT JOIN students_new st ON st.student_id = sc.student_id
+LEFT JOIN teachers_new t ON t.teacher_id = sc.teacher_id
+LEFT JOIN subjects_new s ON s.subject_id = sc.subject_id
+ORDER BY sc.rowid;
+
+DROP TABLE scores;
+DROP TABLE students;
+DROP TABLE teachers;
+DROP TABLE subjects;
+ALTER TABLE teachers_new RENAME TO teachers;
+ALTER TABLE subjects_new RENAME TO subjects;
+ALTER TABLE students_new RENAME TO students;
+ALTER TABLE scores_new RENAME TO scores;
+
+-- Recreate the 0001 indexes on the integer keys
+CREATE INDEX idx_scores_student ON scores (student_key, total_attendance);
+CREATE INDEX idx_students_class ON students (class, student_key);
+CREATE INDEX idx_scores_subject_mark ON scores (subject_key, total_mark);
+CREATE INDEX idx_scores_teacher_mark ON scores (teacher_key, total_mark);
+CREATE INDEX idx_scores_exam_month ON scores (strftime('%Y-%m', exam_date), total_mark, total_attendance);
+
+ANALYZE;
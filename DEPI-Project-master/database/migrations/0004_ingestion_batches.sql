@@ -0,0 +1,27 @@
+-- Migration 0004: Ingestion batches and stage watermarks
+-- Every load (synthetic generation or an `ingest` run) is recorded as a batch and
+-- stamps the score rows it inserts or updates. Downstream stages (EDA, model
+-- training, dashboard cache) store the last batch they processed in
+-- stage_watermarks, so they can restrict work to rows with a newer batch_id.
+
+CREATE TABLE ingestion_batches (
+    batch_id INTEGER PRIMARY KEY,
+    source VARCHAR(255),
+    row_count INTEGER,
+    ingested_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE stage_watermarks (
+    stage VARCHAR(50) PRIMARY KEY,
+    batch_id INTEGER NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE scores ADD COLUMN batch_id INTEGER REFERENCES ingestion_batches(batch_id);
+
+-- Rows that predate this migration form batch 1
+INSERT INTO ingestion_batches (batch_id, source, row_count)
+SELECT 1, 'pre-migration data', COUNT(*) FROM scores HAVING COUNT(*) > 0;
+UPDATE scores SET batch_id = 1;
+
+CREATE INDEX idx_scores_batch ON scores (batch_id);
@@ -0,0 +1,115 @@
+# Migration 0005: Materialized rollups for the insight queries
+# Running count, sum and sum of squares of total_mark and total_attendance per
+# month, month x subject, subject, class, teacher and teacher x subject. Averages
+# and variances come from these in O(groups) instead of correlated subqueries
+# that rescan scores for every output row.
+#
+# Triggers on scores keep the rollups current for incremental writes (ingest).
+# Bulk loads switch them off through rollup_control and rebuild the rollups in
+# one GROUP BY pass afterwards (database/rollups.py), which also generates
+# the trigger DDL.
+
+from database.rollups import trigger_sql
+
+SCRIPT = """
+CREATE TABLE rollup_control (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    enabled INTEGER NOT NULL DEFAULT 1
+);
+INSERT INTO rollup_control (id, enabled) VALUES (1, 1);
+
+CREATE TABLE rollup_month (
+    exam_month VARCHAR(7) NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_mark FLOAT NOT NULL DEFAULT 0,
+    sumsq_mark FLOAT NOT NULL DEFAULT 0,
+    sum_attendance FLOAT NOT NULL DEFAULT 0,
+    sumsq_attendance FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (exam_month)
+);
+
+CREATE TABLE rollup_month_subject (
+    exam_month VARCHAR(7) NOT NULL,
+    subject_key INTEGER NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_mark FLOAT NOT NULL DEFAULT 0,
+    sumsq_mark FLOAT NOT NULL DEFAULT 0,
+    sum_attendance FLOAT NOT NULL DEFAULT 0,
+    sumsq_attendance FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (exam_month, subject_key)
+);
+
+CREATE TABLE rollup_subject (
+    subject_key INTEGER NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_mark FLOAT NOT NULL DEFAULT 0,
+    sumsq_mark FLOAT NOT NULL DEFAULT 0,
+    sum_attendance FLOAT NOT NULL DEFAULT 0,
+    sumsq_attendance FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (subject_key)
+);
+
+CREATE TABLE rollup_class (
+    class VARCHAR(20) NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_mark FLOAT NOT NULL DEFAULT 0,
+    sumsq_mark FLOAT NOT NULL DEFAULT 0,
+    sum_attendance FLOAT NOT NULL DEFAULT 0,
+    sumsq_attendance FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (class)
+);
+
+CREATE TABLE rollup_teacher (
+    teacher_key INTEGER NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_mark FLOAT NOT NULL DEFAULT 0,
+    sumsq_mark FLOAT NOT NULL DEFAULT 0,
+    sum_attendance FLOAT NOT NULL DEFAULT 0,
+    sumsq_attendance FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (teacher_key)
+);
+
+CREATE TABLE rollup_teacher_subject (
+    teacher_key INTEGER NOT NULL,
+    subject_key INTEGER NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    sum_mark FLOAT NOT NULL DEFAULT 0,
+    sumsq_mark FLOAT NOT NULL DEFAULT 0,
+    sum_attendance FLOAT NOT NULL DEFAULT 0,
+    sumsq_attendance FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (teacher_key, subject_key)
+);
+
+-- Initial population from existing rows
+INSERT INTO rollup_month (exam_month, n, sum_mark, sumsq_mark, sum_attendance, sumsq_attendance)
+SELECT COALESCE(strftime('%Y-%m', sc.exam_date), 'Unknown'), COUNT(*), SUM(sc.total_mark), SUM(sc.total_mark * sc.total_mark),
+       SUM(sc.total_attendance), SUM(sc.total_attendance * sc.total_attendance)
+FROM scores sc
+GROUP BY 1;
+INSERT INTO rollup_month_subject (exam_month, subject_key, n, sum_mark, sumsq_mark, sum_attendance, sumsq_attendance)
+SELECT COALESCE(strftime('%Y-%m', sc.exam_date), 'Unknown'), sc.subject_key, COUNT(*), SUM(sc.total_mark), SUM(sc.total_mark * sc.total_mark),
+       SUM(sc.total_attendance), SUM(sc.total_attendance * sc.total_attendance)
+FROM scores sc
+GROUP BY 1, 2;
+INSERT INTO rollup_subject (subject_key, n, sum_mark, sumsq_mark, sum_attendance, sumsq_attendance)
+SELECT sc.subject_key, COUNT(*), SUM(sc.total_mark), SUM(sc.total_mark * sc.total_mark),
+       SUM(sc.total_attendance), SUM(sc.total_attendance * sc.total_attendance)
+FROM scores sc
+GROUP BY 1;
+INSERT INTO rollup_class (class, n, sum_mark, sumsq_mark, sum_attendance, sumsq_attendance)
+SELECT COALESCE(st.class, 'Unknown'), COUNT(*), SUM(sc.total_mark), SUM(sc.total_mark * sc.total_mark),
+       SUM(sc.total_attendance), SUM(sc.total_attendance * sc.total_attendance)
+FROM scores sc JOIN students st ON st.student_key = sc.student_key
+GROUP BY 1;
+INSERT INTO rollup_teacher (teacher_key, n, sum_mark, sumsq_mark, sum_attendance, sumsq_attendance)
+SELECT sc.teacher_key, COUNT(*), SUM(sc.total_mark), SUM(sc.total_mark * sc.total_mark),
+       SUM(sc.total_attendance), SUM(sc.total_attendance * sc.total_attendance)
+FROM scores sc
+GROUP BY 1;
+INSERT INTO rollup_teacher_subject (teacher_key, subject_key, n, sum_mark, sumsq_mark, sum_attendance, sumsq_attendance)
+SELECT sc.teacher_key, sc.subject_key, COUNT(*), SUM(sc.total_mark), SUM(sc.total_mark * sc.total_mark),
+       SUM(sc.total_attendance), SUM(sc.total_attendance * sc.total_attendance)
+FROM scores sc
+GROUP BY 1, 2;
+
+""" + trigger_sql("strftime('%Y-%m', {row}.exam_date)")  # Incremental maintenance; exam_month arrives in 0006
@@ -0,0 +1,72 @@
+# Migration 0006: Stored exam_month column
+# Monthly analytics bucket scores by strftime('%Y-%m', exam_date). A STORED
+# generated column computes that string once per write instead of once per row
+# read, and the index on it turns time-bucketed queries into range scans.
+# SQLite can only ALTER in VIRTUAL generated columns, so scores is rebuilt
+# (keys and batch stamps preserved). The rollup triggers are recreated from
+# database/rollups.py to read NEW.exam_month / OLD.exam_month;
+# students_rollup_class is dropped first so the rename does not trip over its
+# reference to scores.
+
+from database.rollups import trigger_sql
+
+SCRIPT = """
+DROP TRIGGER scores_rollup_insert;
+DROP TRIGGER scores_rollup_delete;
+DROP TRIGGER scores_rollup_update;
+DROP TRIGGER students_rollup_class;
+
+CREATE TABLE scores_new (
+    score_key INTEGER PRIMARY KEY,
+    score_id VARCHAR(50) NOT NULL UNIQUE,
+    student_key INTEGER REFERENCES students(student_key),
+    teacher_key INTEGER REFERENCES teachers(teacher_key),
+    subject_key INTEGER REFERENCES subjects(subject_key),
+    exam_1 FLOAT,
+    exam_2 FLOAT,
+    exam_3 FLOAT,
+    lecture_1 BOOLEAN,
+    lecture_2 BOOLEAN,
+    lecture_3 BOOLEAN,
+    lecture_4 BOOLEAN,
+    lecture_5 BOOLEAN,
+    lecture_6 BOOLEAN,
+    lecture_7 BOOLEAN,
+    lecture_8 BOOLEAN,
+    lecture_9 BOOLEAN,
+    lecture_10 BOOLEAN,
+    total_attendance INTEGER,
+    total_mark FLOAT,
+    exam_date DATE,
+    attendance_mask INTEGER,
+    batch_id INTEGER REFERENCES ingestion_batches(batch_id),
+    exam_month VARCHAR(7) GENERATED ALWAYS AS (strftime('%Y-%m', exam_date)) STORED
+);
+INSERT INTO scores_new (
+    score_key, score_id, student_key, teacher_key, subject_key,
+    exam_1, exam_2, exam_3,
+    lecture_1, lecture_2, lecture_3, lecture_4, lecture_5,
+    lecture_6, lecture_7, lecture_8, lecture_9, lecture_10,
+    total_attendance, total_mark, exam_date, attendance_mask, batch_id
+)
+SELECT
+    score_key, score_id, student_key, teacher_key, subject_key,
+    exam_1, exam_2, exam_3,
+    lecture_1, lecture_2, lecture_3, lecture_4, lecture_5,
+    lecture_6, lecture_7, lecture_8, lecture_9, lecture_10,
+    total_attendance, total_mark, exam_date, attendance_mask, batch_id
+FROM scores ORDER BY score_key;
+
+DROP TABLE scores;
+ALTER TABLE scores_new RENAME TO scores;
+
+CREATE INDEX idx_scores_student ON scores (student_key, total_attendance);
+CREATE INDEX idx_scores_subject_mark ON scores (subject_key, total_mark);
+CREATE INDEX idx_scores_teacher_mark ON scores (teacher_key, total_mark);
+CREATE INDEX idx_scores_batch ON scores (batch_id);
+-- Replaces the 0001 expression index on strftime('%Y-%m', exam_date)
+CREATE INDEX idx_scores_exam_month ON scores (exam_month, total_mark, total_attendance);
+
+""" + trigger_sql() + """
+ANALYZE;
+"""
@@ -0,0 +1,22 @@
+-- Migration 0007: Stored model predictions
+-- models/batch_score.py scores every exam row with the latest registry versions
+-- of score_predictor and performance_classifier and upserts the results here, so
+-- the dashboard and SQL insights join predictions instead of loading the models.
+-- Each row records the model versions and the score batch it was computed from;
+-- rows are rescored when their batch is newer than the 'score' watermark or the
+-- model versions change.
+
+CREATE TABLE predictions (
+    score_key INTEGER PRIMARY KEY REFERENCES scores(score_key),
+    predicted_mark FLOAT,
+    predicted_group VARCHAR(10),
+    prob_high FLOAT,
+    prob_medium FLOAT,
+    prob_low FLOAT,
+    regressor_version INTEGER,
+    classifier_version INTEGER,
+    batch_id INTEGER REFERENCES ingestion_batches(batch_id),
+    predicted_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_predictions_group ON predictions (predicted_group, prob_low);
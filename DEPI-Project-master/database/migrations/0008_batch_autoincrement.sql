@@ -0,0 +1,27 @@
+-- Migration 0008: Batch IDs never repeat
+-- ingestion_batches.batch_id was a plain INTEGER PRIMARY KEY, so after `generate`
+-- emptied the table the numbering restarted at 1 and latest_batch() went
+-- backwards. With AUTOINCREMENT, SQLite keeps the highest ID ever issued in
+-- sqlite_sequence, so a new batch always gets a larger ID than any earlier one,
+-- even after the table is cleared, and batch IDs can serve as a data version.
+
+CREATE TABLE ingestion_batches_new (
+    batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source VARCHAR(255),
+    row_count INTEGER,
+    ingested_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO ingestion_batches_new (batch_id, source, row_count, ingested_at)
+SELECT batch_id, source, row_count, ingested_at FROM ingestion_batches ORDER BY batch_id;
+
+-- Stages may already have processed a higher batch than survives here (a
+-- regenerate restarted the numbering), so new IDs start above their watermarks
+INSERT INTO sqlite_sequence (name, seq)
+SELECT 'ingestion_batches_new', 0
+WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'ingestion_batches_new');
+UPDATE sqlite_sequence
+SET seq = MAX(seq, (SELECT COALESCE(MAX(batch_id), 0) FROM stage_watermarks))
+WHERE name = 'ingestion_batches_new';
+
+DROP TABLE ingestion_batches;
+ALTER TABLE ingestion_batches_new RENAME TO ingestion_batches;
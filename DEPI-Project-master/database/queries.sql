@@ -1,5 +1,11 @@
 -- SQL Queries for Student Performance Dashboard
 -- This file contains the SQL logic powering the dashboard's visualizations and insights.
+-- Tables join on integer surrogate keys (*_key); text IDs (student_id, ...) are lookup columns only.
+-- Group averages and variances come from the rollup_* tables (migration 0005), which hold
+-- running counts, sums and sums of squares kept current by triggers on scores.
+-- mean = sum / n, variance = sumsq / n - mean * mean (population variance).
+-- Each query is named by its "-- N.N" header and run by database/query_registry.py.
+-- Thresholds are bound parameters (:name); "-- PARAMS:" lines give their defaults.
 
 -- ==========================================
 -- PART 1: Attendance Trends
@@ -8,19 +14,17 @@
 -- 1.1 Student Attendance vs Class Average (Insight)
 -- VISUALIZATION: None (Used for identifying at-risk students in "Raw Data" or alerts)
 -- INSIGHT: Identifies students who are significantly below their class average attendance.
+-- PARAMS: max_diff=-2
 SELECT 
     st.first_name || ' ' || st.last_name as student_name,
     st.class,
     sc.total_attendance,
-    (SELECT AVG(total_attendance) FROM scores s2 
-     JOIN students st2 ON s2.student_id = st2.student_id 
-     WHERE st2.class = st.class) as class_avg_attendance,
-    sc.total_attendance - (SELECT AVG(total_attendance) FROM scores s2 
-                           JOIN students st2 ON s2.student_id = st2.student_id 
-                           WHERE st2.class = st.class) as diff_from_class_avg
+    rc.sum_attendance * 1.0 / rc.n as class_avg_attendance,
+    sc.total_attendance - rc.sum_attendance * 1.0 / rc.n as diff_from_class_avg
 FROM scores sc
-JOIN students st ON sc.student_id = st.student_id
-WHERE diff_from_class_avg < -2 
+JOIN students st ON sc.student_key = st.student_key
+JOIN rollup_class rc ON rc.class = COALESCE(st.class, 'Unknown')
+WHERE diff_from_class_avg < :max_diff
 ORDER BY diff_from_class_avg ASC;
 
 -- 1.2 Monthly Attendance Volatility (Visualization)
@@ -32,14 +36,30 @@ SELECT
     attendance_variance
 FROM (
     SELECT 
-        strftime('%Y-%m', exam_date) as month,
-        AVG(total_attendance) as avg_attendance,
-        (MAX(total_attendance) - MIN(total_attendance)) as attendance_variance
-    FROM scores
-    GROUP BY month
+        exam_month as month,
+        sum_attendance * 1.0 / n as avg_attendance,
+        sumsq_attendance * 1.0 / n - (sum_attendance * 1.0 / n) * (sum_attendance * 1.0 / n) as attendance_variance
+    FROM rollup_month
 ) as MonthlyStats
 ORDER BY attendance_variance DESC;
 
+-- 1.3 Chronic Absence Streaks (Insight)
+-- VISUALIZATION: "Lecture Attendance" chart (EDA)
+-- INSIGHT: Students who missed 3 or more lectures in a row in any subject, read from the bit-packed attendance_mask.
+-- PARAMS: min_streak=3
+-- Note: ABSENCE_STREAK() and POPCOUNT() are registered by database/connection.py.
+SELECT 
+    st.first_name || ' ' || st.last_name as student_name,
+    st.class,
+    COUNT(*) as subjects_with_streak,
+    MAX(ABSENCE_STREAK(sc.attendance_mask)) as longest_absence_streak,
+    AVG(POPCOUNT(sc.attendance_mask)) as avg_lectures_attended
+FROM scores sc
+JOIN students st ON sc.student_key = st.student_key
+WHERE ABSENCE_STREAK(sc.attendance_mask) >= :min_streak
+GROUP BY st.student_key
+ORDER BY longest_absence_streak DESC, subjects_with_streak DESC;
+
 -- ==========================================
 -- PART 2: Monthly Performance
 -- ==========================================
@@ -47,32 +67,32 @@ ORDER BY attendance_variance DESC;
 -- 2.1 Subject Performance vs Monthly Global Average (Visualization)
 -- VISUALIZATION: "Subject Performance vs Global Average" Heatmap (Advanced Insights Page)
 -- INSIGHT: Reveals if a specific subject was harder or easier than the school average for a given month.
+-- PARAMS: min_gap=5
 SELECT 
-    strftime('%Y-%m', sc.exam_date) as month,
+    ms.exam_month as month,
     s.subject_name,
-    AVG(sc.total_mark) as subject_monthly_avg,
-    (SELECT AVG(total_mark) FROM scores s2 
-     WHERE strftime('%Y-%m', s2.exam_date) = strftime('%Y-%m', sc.exam_date)) as global_monthly_avg,
-    AVG(sc.total_mark) - (SELECT AVG(total_mark) FROM scores s2 
-                          WHERE strftime('%Y-%m', s2.exam_date) = strftime('%Y-%m', sc.exam_date)) as performance_gap
-FROM scores sc
-JOIN subjects s ON sc.subject_id = s.subject_id
-GROUP BY month, s.subject_name
-HAVING performance_gap > 5 OR performance_gap < -5 
+    ms.sum_mark * 1.0 / ms.n as subject_monthly_avg,
+    m.sum_mark * 1.0 / m.n as global_monthly_avg,
+    ms.sum_mark * 1.0 / ms.n - m.sum_mark * 1.0 / m.n as performance_gap
+FROM rollup_month_subject ms
+JOIN rollup_month m ON m.exam_month = ms.exam_month
+JOIN subjects s ON ms.subject_key = s.subject_key
+WHERE performance_gap > :min_gap OR performance_gap < -:min_gap
 ORDER BY month, performance_gap DESC;
 
 -- 2.2 Consistent High Performers (Insight)
 -- VISUALIZATION: "Top Performers" Table (Overview Page)
 -- INSIGHT: Lists students who maintained a score above 85 in ALL exams.
+-- PARAMS: min_mark=85
 SELECT 
     st.first_name || ' ' || st.last_name as student_name,
     st.class
 FROM students st
-WHERE st.student_id IN (
-    SELECT student_id 
+WHERE st.student_key IN (
+    SELECT student_key 
     FROM scores 
-    GROUP BY student_id 
-    HAVING MIN(total_mark) > 85
+    GROUP BY student_key 
+    HAVING MIN(total_mark) > :min_mark
 );
 
 -- ==========================================
@@ -82,17 +102,18 @@ WHERE st.student_id IN (
 -- 3.1 Teacher Impact on "At-Risk" Students (Visualization)
 -- VISUALIZATION: "Best Teachers for At-Risk Students" Bar Chart (Advanced Insights Page)
 -- INSIGHT: Highlights teachers who achieve high scores even with students who have low attendance (<5).
+-- PARAMS: max_attendance=5, min_taught=5
 SELECT 
     t.first_name || ' ' || t.last_name as teacher_name,
-    COUNT(sc.score_id) as at_risk_students_taught,
+    COUNT(sc.score_key) as at_risk_students_taught,
     AVG(sc.total_mark) as avg_score_for_at_risk
 FROM scores sc
-JOIN teachers t ON sc.teacher_id = t.teacher_id
-WHERE sc.student_id IN (
-    SELECT student_id FROM scores WHERE total_attendance < 5
+JOIN teachers t ON sc.teacher_key = t.teacher_key
+WHERE sc.student_key IN (
+    SELECT student_key FROM scores WHERE total_attendance < :max_attendance
 )
-GROUP BY t.teacher_id
-HAVING at_risk_students_taught > 5
+GROUP BY t.teacher_key
+HAVING at_risk_students_taught > :min_taught
 ORDER BY avg_score_for_at_risk DESC;
 
 -- 3.2 Teacher Value Added (Subquery)
@@ -102,28 +123,81 @@ ORDER BY avg_score_for_at_risk DESC;
 SELECT 
     t.first_name || ' ' || t.last_name as teacher_name,
     s.subject_name,
-    AVG(sc.total_mark) as teacher_avg_score,
-    (SELECT AVG(total_mark) FROM scores s2 WHERE s2.subject_id = sc.subject_id) as subject_global_avg,
-    AVG(sc.total_mark) - (SELECT AVG(total_mark) FROM scores s2 WHERE s2.subject_id = sc.subject_id) as value_added
-FROM scores sc
-JOIN teachers t ON sc.teacher_id = t.teacher_id
-JOIN subjects s ON sc.subject_id = s.subject_id
-GROUP BY t.teacher_id, s.subject_name
+    ts.sum_mark * 1.0 / ts.n as teacher_avg_score,
+    rs.sum_mark * 1.0 / rs.n as subject_global_avg,
+    ts.sum_mark * 1.0 / ts.n - rs.sum_mark * 1.0 / rs.n as value_added
+FROM rollup_teacher_subject ts
+JOIN rollup_subject rs ON rs.subject_key = ts.subject_key
+JOIN teachers t ON ts.teacher_key = t.teacher_key
+JOIN subjects s ON ts.subject_key = s.subject_key
 ORDER BY value_added DESC;
 
 -- 3.3 Teacher Consistency (Variance Analysis)
 -- VISUALIZATION: "Teacher Consistency" Table (Advanced Insights Page)
 -- INSIGHT: Measures the standard deviation of scores. Lower deviation means the teacher produces consistent results across all students.
--- Note: SQLite doesn't have a native STDEV function by default in all versions, so we approximate variance or use a complex calculation.
--- Here we calculate the range (Max - Min) and Average Deviation as proxies for consistency.
+-- Note: variance comes straight from the rollup's running sums, so no scan of scores is needed.
+-- PARAMS: min_taught=10
 SELECT 
     t.first_name || ' ' || t.last_name as teacher_name,
-    COUNT(sc.score_id) as students_taught,
+    rt.n as students_taught,
+    rt.sum_mark * 1.0 / rt.n as avg_score,
+    rt.sumsq_mark * 1.0 / rt.n - (rt.sum_mark * 1.0 / rt.n) * (rt.sum_mark * 1.0 / rt.n) as score_variance
+FROM rollup_teacher rt
+JOIN teachers t ON rt.teacher_key = t.teacher_key
+WHERE rt.n > :min_taught
+ORDER BY score_variance ASC; -- Ascending because lower variance = higher consistency
+
+-- 3.4 Subject Score Spread (Distribution Analysis)
+-- VISUALIZATION: "Statistical Analysis" Page (score distribution by subject)
+-- INSIGHT: Shows how widely marks spread within each subject; a wide interquartile range means the subject separates students strongly.
+-- Note: STDDEV(), MEDIAN() and QUANTILE() are single-pass aggregates registered by database/connection.py.
+-- QUANTILE(x, p) returns NULL when p is not a number between 0 and 1.
+SELECT 
+    s.subject_name,
+    COUNT(sc.score_key) as exams_taken,
     AVG(sc.total_mark) as avg_score,
-    (MAX(sc.total_mark) - MIN(sc.total_mark)) as score_range,
-    AVG(ABS(sc.total_mark - (SELECT AVG(total_mark) FROM scores s2 WHERE s2.teacher_id = t.teacher_id))) as avg_deviation
+    STDDEV(sc.total_mark) as score_stddev,
+    MEDIAN(sc.total_mark) as median_score,
+    QUANTILE(sc.total_mark, 0.75) - QUANTILE(sc.total_mark, 0.25) as interquartile_range
 FROM scores sc
-JOIN teachers t ON sc.teacher_id = t.teacher_id
-GROUP BY t.teacher_id
-HAVING students_taught > 10
-ORDER BY avg_deviation ASC; -- Ascending because lower deviation = higher consistency
+JOIN subjects s ON sc.subject_key = s.subject_key
+GROUP BY s.subject_key
+ORDER BY score_stddev DESC;
+
+-- 3.5 Class Score Spread (Distribution Analysis)
+-- VISUALIZATION: "Statistical Analysis" Page (score distribution by class)
+-- INSIGHT: Compares the spread of marks between classes; a high deviation flags classes with a wide ability gap.
+SELECT 
+    st.class,
+    COUNT(sc.score_key) as exams_taken,
+    AVG(sc.total_mark) as avg_score,
+    STDDEV(sc.total_mark) as score_stddev,
+    MEDIAN(sc.total_mark) as median_score,
+    QUANTILE(sc.total_mark, 0.75) - QUANTILE(sc.total_mark, 0.25) as interquartile_range
+FROM scores sc
+JOIN students st ON sc.student_key = st.student_key
+GROUP BY st.class
+ORDER BY score_stddev DESC;
+
+-- ==========================================
+-- PART 4: Model Predictions
+-- ==========================================
+
+-- 4.1 Predicted At-Risk Students (Insight)
+-- VISUALIZATION: "Model Predictions" section (Predictive Analytics Page)
+-- INSIGHT: Exam results the classifier places in the Low group with high confidence, with the predicted mark next to the actual one.
+-- PARAMS: min_prob=0.6
+-- Note: predictions are written by models/batch_score.py; rows appear once it has run.
+SELECT 
+    st.first_name || ' ' || st.last_name as student_name,
+    st.class,
+    s.subject_name,
+    sc.total_mark,
+    p.predicted_mark,
+    p.prob_low
+FROM predictions p
+JOIN scores sc ON sc.score_key = p.score_key
+JOIN students st ON sc.student_key = st.student_key
+JOIN subjects s ON sc.subject_key = s.subject_key
+WHERE p.predicted_group = 'Low' AND p.prob_low >= :min_prob
+ORDER BY p.prob_low DESC;
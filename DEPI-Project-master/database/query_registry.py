@@ -0,0 +1,180 @@
+import argparse
+import os
+import re
+import sys
+import time
+from collections import OrderedDict, namedtuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_read
+
+# Configuration
+DB_PATH = 'student_performance.db'
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'queries.sql')
+CACHE_SIZE = 128    # Cached results kept per registry (least recently used evicted)
+
+HEADER_RE = re.compile(r'^--\s*(\d+\.\d+)\s+(.*)$')
+PARAMS_RE = re.compile(r'^--\s*PARAMS:\s*(.*)$')
+
+Query = namedtuple('Query', ['name', 'title', 'sql', 'defaults'])
+QueryResult = namedtuple('QueryResult', ['name', 'columns', 'rows', 'seconds', 'plan', 'cached'])
+
+
+def _parse_value(text):
+    """Turn a PARAMS default into an int, float or plain string."""
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_queries(path=QUERIES_PATH):
+    """Split queries.sql into named queries, keyed by their "-- N.N" header.
+
+    Comment lines are dropped from the SQL; a "-- PARAMS: a=1, b=2" line
+    sets the defaults for the statement's :a and :b placeholders.
+    """
+    queries = OrderedDict()
+    name = title = None
+    lines, defaults = [], {}
+
+    def flush():
+        sql = '\n'.join(lines).strip()
+        if name and sql:
+            queries[name] = Query(name, title, sql.rstrip(';').strip(), defaults)
+
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            header = HEADER_RE.match(line)
+            if header:
+                flush()
+                name, title = header.group(1), header.group(2).strip()
+                lines, defaults = [], {}
+                continue
+            params = PARAMS_RE.match(line)
+            if params:
+                for item in params.group(1).split(','):
+                    key, value = item.split('=', 1)
+                    defaults[key.strip()] = _parse_value(value.strip())
+            elif not line.lstrip().startswith('--'):
+                # Drop trailing "; -- comment" so only the statement remains
+                lines.append(line.split(';', 1)[0] + (';' if ';' in line else ''))
+    flush()
+    return queries
+
+
+def _format_plan(rows):
+    """Render EXPLAIN QUERY PLAN rows as an indented tree."""
+    depth = {0: -1}
+    out = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        out.append('  ' * depth[node_id] + detail)
+    return out
+
+
+class QueryRegistry:
+    """Runs the named queries from queries.sql with caching and timing.
+
+    Results are cached by (name, params, data version). The data version is
+    SQLite's PRAGMA data_version, which changes whenever another connection
+    commits, so a cached result is served only while the database is
+    unchanged. Every call is appended to `history`.
+    """
+
+    def __init__(self, db_path=DB_PATH, queries_path=QUERIES_PATH, cache_size=CACHE_SIZE):
+        self.queries = parse_queries(queries_path)
+        self.conn = connect_read(db_path)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.history = []
+
+    def close(self):
+        self.conn.close()
+
+    def data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def bind(self, name, params=None):
+        """Defaults for `name` overridden by `params`; unknown names are rejected."""
+        query = self.queries[name]
+        params = dict(params or {})
+        unknown = set(params) - set(query.defaults)
+        if unknown:
+            raise ValueError(f"Query {name} has no parameter(s): {', '.join(sorted(unknown))}")
+        return {**query.defaults, **params}
+
+    def explain(self, name, params=None):
+        query = self.queries[name]
+        rows = self.conn.execute(f"EXPLAIN QUERY PLAN {query.sql}", self.bind(name, params)).fetchall()
+        return _format_plan(rows)
+
+    def run(self, name, params=None):
+        """Execute query `name` (or serve it from cache) and return a QueryResult."""
+        query = self.queries[name]
+        bound = self.bind(name, params)
+        key = (name, tuple(sorted(bound.items())), self.data_version())
+
+        start = time.perf_counter()
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            result = hit._replace(seconds=time.perf_counter() - start, cached=True)
+        else:
+            cursor = self.conn.execute(query.sql, bound)
+            rows = cursor.fetchall()
+            seconds = time.perf_counter() - start
+            columns = [d[0] for d in cursor.description]
+            result = QueryResult(name, columns, rows, seconds, self.explain(name, params), False)
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        self.history.append({
+            'name': name, 'params': bound, 'rows': len(result.rows),
+            'seconds': result.seconds, 'cached': result.cached,
+        })
+        return result
+
+
+def report(db_path=DB_PATH, names=None, params=None, repeat=1, show_plan=False):
+    """Run each query `repeat` times and print rows, wall time and plan."""
+    registry = QueryRegistry(db_path)
+    try:
+        names = names or list(registry.queries)
+        declared = {key for name in names for key in registry.queries[name].defaults}
+        unknown = set(params or {}) - declared
+        if unknown:
+            raise ValueError(f"No selected query has parameter(s): {', '.join(sorted(unknown))}")
+        for name in names:
+            query = registry.queries[name]
+            print(f"{name} {query.title}")
+            for _ in range(repeat):
+                result = registry.run(name, {k: v for k, v in (params or {}).items() if k in query.defaults})
+                source = 'cache' if result.cached else 'sqlite'
+                print(f"    {len(result.rows)} rows in {result.seconds * 1000:.2f} ms ({source})")
+            if show_plan:
+                for line in result.plan:
+                    print(f"    | {line}")
+    finally:
+        registry.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the named queries in queries.sql and report timings.")
+    parser.add_argument('names', nargs='*', help="Queries to run, e.g. 1.1 3.2 (default: all)")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database to query")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE',
+                        help="Override a query parameter (repeatable)")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per query; repeats are served from cache")
+    parser.add_argument('--plan', action='store_true', help="Print EXPLAIN QUERY PLAN for each query")
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.param:
+        key, value = item.split('=', 1)
+        overrides[key.strip()] = _parse_value(value.strip())
+    report(args.db, args.names, overrides, args.repeat, args.plan)
@@ -0,0 +1,120 @@
+# Rollup maintenance: trigger DDL for the migrations and bulk rebuilds (tables: migration 0005)
+
+# Rollup table -> (key columns, key expressions over `scores sc JOIN students st`)
+ROLLUPS = {
+    'rollup_month': (['exam_month'], ["COALESCE(sc.exam_month, 'Unknown')"]),
+    'rollup_month_subject': (['exam_month', 'subject_key'], ["COALESCE(sc.exam_month, 'Unknown')", 'sc.subject_key']),
+    'rollup_subject': (['subject_key'], ['sc.subject_key']),
+    'rollup_class': (['class'], ["COALESCE(st.class, 'Unknown')"]),
+    'rollup_teacher': (['teacher_key'], ['sc.teacher_key']),
+    'rollup_teacher_subject': (['teacher_key', 'subject_key'], ['sc.teacher_key', 'sc.subject_key']),
+}
+
+# Rollup table -> key expressions for one scores row ({row} is NEW or OLD, {month} its month)
+ROW_KEYS = {
+    'rollup_month': ["COALESCE({month}, 'Unknown')"],
+    'rollup_month_subject': ["COALESCE({month}, 'Unknown')", '{row}.subject_key'],
+    'rollup_subject': ['{row}.subject_key'],
+    'rollup_class': ["(SELECT COALESCE(class, 'Unknown') FROM students WHERE student_key = {row}.student_key)"],
+    'rollup_teacher': ['{row}.teacher_key'],
+    'rollup_teacher_subject': ['{row}.teacher_key', '{row}.subject_key'],
+}
+MONTH = '{row}.exam_month'   # Stored column since migration 0006
+TRIGGER_COLUMNS = 'student_key, teacher_key, subject_key, total_mark, total_attendance, exam_date'
+TRIGGER_WHEN = 'WHEN (SELECT enabled FROM rollup_control WHERE id = 1)'
+STATS = ['sum_mark', 'sumsq_mark', 'sum_attendance', 'sumsq_attendance']
+NEW_STATS = 'NEW.total_mark, NEW.total_mark * NEW.total_mark, NEW.total_attendance, NEW.total_attendance * NEW.total_attendance'
+
+STUDENTS_TRIGGER = """-- A student changing class moves their scores between class rollups
+CREATE TRIGGER students_rollup_class AFTER UPDATE OF class ON students
+WHEN (SELECT enabled FROM rollup_control WHERE id = 1) AND COALESCE(OLD.class, 'Unknown') <> COALESCE(NEW.class, 'Unknown')
+BEGIN
+    UPDATE rollup_class SET
+        n = n - (SELECT COUNT(*) FROM scores WHERE student_key = NEW.student_key),
+        sum_mark = sum_mark - (SELECT COALESCE(SUM(total_mark), 0) FROM scores WHERE student_key = NEW.student_key),
+        sumsq_mark = sumsq_mark - (SELECT COALESCE(SUM(total_mark * total_mark), 0) FROM scores WHERE student_key = NEW.student_key),
+        sum_attendance = sum_attendance - (SELECT COALESCE(SUM(total_attendance), 0) FROM scores WHERE student_key = NEW.student_key),
+        sumsq_attendance = sumsq_attendance - (SELECT COALESCE(SUM(total_attendance * total_attendance), 0) FROM scores WHERE student_key = NEW.student_key)
+    WHERE class = COALESCE(OLD.class, 'Unknown');
+    INSERT INTO rollup_class (class, n, sum_mark, sumsq_mark, sum_attendance, sumsq_attendance)
+    SELECT COALESCE(NEW.class, 'Unknown'), COUNT(*), SUM(total_mark), SUM(total_mark * total_mark),
+           SUM(total_attendance), SUM(total_attendance * total_attendance)
+    FROM scores WHERE student_key = NEW.student_key
+    HAVING COUNT(*) > 0
+    ON CONFLICT (class) DO UPDATE SET
+        n = n + excluded.n,
+        sum_mark = sum_mark + excluded.sum_mark,
+        sumsq_mark = sumsq_mark + excluded.sumsq_mark,
+        sum_attendance = sum_attendance + excluded.sum_attendance,
+        sumsq_attendance = sumsq_attendance + excluded.sumsq_attendance;
+    DELETE FROM rollup_class WHERE n <= 0;
+END;"""
+
+
+def _row_keys(table, row, month):
+    return [expr.format(row=row, month=month.format(row=row)) for expr in ROW_KEYS[table]]
+
+
+def _add_row(table, month):
+    """Upsert NEW into one rollup table."""
+    keys = ROLLUPS[table][0]
+    updates = ',\n'.join(f'        {s} = {s} + excluded.{s}' for s in STATS)
+    return (f"    INSERT INTO {table} ({', '.join(keys)}, n, {', '.join(STATS)})\n"
+            f"    VALUES ({', '.join(_row_keys(table, 'NEW', month))}, 1, {NEW_STATS})\n"
+            f"    ON CONFLICT ({', '.join(keys)}) DO UPDATE SET\n"
+            f"        n = n + 1,\n{updates};")
+
+
+def _remove_row(table, month):
+    """Subtract OLD from one rollup table."""
+    keys = ROLLUPS[table][0]
+    where = ' AND '.join(f'{key} = {expr}' for key, expr in zip(keys, _row_keys(table, 'OLD', month)))
+    return (f"    UPDATE {table} SET\n"
+            f"        n = n - 1,\n"
+            f"        sum_mark = sum_mark - OLD.total_mark,\n"
+            f"        sumsq_mark = sumsq_mark - OLD.total_mark * OLD.total_mark,\n"
+            f"        sum_attendance = sum_attendance - OLD.total_attendance,\n"
+            f"        sumsq_attendance = sumsq_attendance - OLD.total_attendance * OLD.total_attendance\n"
+            f"    WHERE {where};")
+
+
+def trigger_sql(month=MONTH):
+    """CREATE TRIGGER statements that keep every rollup current as scores and students change.
+
+    `month` is the SQL for a row's exam month, with {row} standing for NEW
+    or OLD; migration 0005 predates the stored column and passes an
+    strftime() over exam_date instead.
+    """
+    cleanup = '\n'.join(f'    DELETE FROM {table} WHERE n <= 0;' for table in ROLLUPS)
+    add = '\n'.join(_add_row(table, month) for table in ROLLUPS)
+    remove = '\n'.join(_remove_row(table, month) for table in ROLLUPS)
+    return '\n\n'.join([
+        f"CREATE TRIGGER scores_rollup_insert AFTER INSERT ON scores\n{TRIGGER_WHEN}\nBEGIN\n{add}\nEND;",
+        f"CREATE TRIGGER scores_rollup_delete AFTER DELETE ON scores\n{TRIGGER_WHEN}\nBEGIN\n{remove}\n{cleanup}\nEND;",
+        f"CREATE TRIGGER scores_rollup_update AFTER UPDATE OF {TRIGGER_COLUMNS} ON scores\n{TRIGGER_WHEN}\n"
+        f"BEGIN\n{remove}\n{add}\n{cleanup}\nEND;",
+        STUDENTS_TRIGGER,
+    ]) + '\n'
+
+
+def set_rollups_enabled(conn, enabled):
+    """Switch the incremental rollup triggers on or off (caller commits)."""
+    conn.execute("UPDATE rollup_control SET enabled = ? WHERE id = 1", (1 if enabled else 0,))
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup table from scores in one GROUP BY pass each (caller commits).
+
+    Used after bulk loads, where per-row trigger maintenance would dominate
+    the insert cost.
+    """
+    for table, (keys, exprs) in ROLLUPS.items():
+        join = "JOIN students st ON st.student_key = sc.student_key" if table == 'rollup_class' else ""
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"""
+            INSERT INTO {table} ({', '.join(keys)}, n, sum_mark, sumsq_mark, sum_attendance, sumsq_attendance)
+            SELECT {', '.join(exprs)}, COUNT(*), SUM(sc.total_mark), SUM(sc.total_mark * sc.total_mark),
+                   SUM(sc.total_attendance), SUM(sc.total_attendance * sc.total_attendance)
+            FROM scores sc {join}
+            GROUP BY {', '.join(str(i + 1) for i in range(len(keys)))}
+        """)
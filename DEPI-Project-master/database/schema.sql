@@ -1,4 +1,11 @@
 -- Schema for Student Performance Dashboard
+-- Baseline schema; later changes live in database/migrations and are applied by init_db().
+
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(100),
+    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
 
 CREATE TABLE IF NOT EXISTS teachers (
     teacher_id VARCHAR(50) PRIMARY KEY,
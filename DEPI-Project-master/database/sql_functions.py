@@ -0,0 +1,169 @@
+from database.attendance import FULL_MASK
+
+EXACT_QUANTILE_LIMIT = 1000   # Values per group answered exactly before switching to P-square
+
+
+def _popcount(mask):
+    return None if mask is None else bin(mask).count('1')
+
+
+def _lecture_attended(mask, lecture):
+    """1 if lecture (1-based) is set in the mask."""
+    if mask is None or lecture is None:
+        return None
+    return (mask >> (lecture - 1)) & 1
+
+
+def _absence_streak(mask):
+    """Longest run of consecutive missed lectures in the mask."""
+    if mask is None:
+        return None
+    runs, streak = ~mask & FULL_MASK, 0
+    while runs:
+        streak += 1
+        runs &= runs >> 1
+    return streak
+
+
+class _Variance:
+    """Single-pass sample variance (Welford); NULLs are skipped."""
+    ddof = 1
+
+    def __init__(self):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        if self.n <= self.ddof:
+            return None
+        return self.m2 / (self.n - self.ddof)
+
+
+class _Stddev(_Variance):
+    def finalize(self):
+        variance = super().finalize()
+        return None if variance is None else variance ** 0.5
+
+
+class _VariancePop(_Variance):
+    ddof = 0
+
+
+class _StddevPop(_Stddev):
+    ddof = 0
+
+
+class _Quantile:
+    """Streaming p-quantile estimate with the P-square algorithm (Jain & Chlamtac).
+
+    The first EXACT_QUANTILE_LIMIT values are buffered and answered exactly
+    (linear interpolation, as numpy.quantile). Past that the buffer seeds five
+    markers and only those are kept, so memory stays bounded per group.
+
+    A fraction outside [0, 1] (or not a number) makes the result NULL:
+    SQLite reports an exception raised here only as a generic
+    "user-defined aggregate's 'step' method raised error".
+    """
+
+    def __init__(self):
+        self.p = None
+        self.invalid = False
+        self.values = []
+        self.q = None
+
+    def step(self, value, p=0.5):
+        if value is None or self.invalid:
+            return
+        if self.p is None:
+            if not isinstance(p, (int, float)) or not 0 <= p <= 1:
+                self.invalid = True
+                self.values = None
+                return
+            self.p = p
+        value = float(value)
+        if self.q is None:
+            self.values.append(value)
+            if len(self.values) > EXACT_QUANTILE_LIMIT:
+                self._seed_markers()
+            return
+
+        q, pos = self.q, self.pos
+        if value < q[0]:
+            q[0], k = value, 0
+        elif value >= q[4]:
+            q[4], k = value, 3
+        else:
+            k = next(i for i in range(4) if value < q[i + 1])
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self.desired[i] += self.incr[i]
+
+        # Nudge the three middle markers toward their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = q[i] + d / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + d) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+                    + (pos[i + 1] - pos[i] - d) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1])
+                )
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] += d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                pos[i] += d
+
+    def _seed_markers(self):
+        """Place the five markers at their target ranks in the sorted buffer."""
+        values = sorted(self.values)
+        last = len(values) - 1
+        self.incr = [0, self.p / 2, self.p, (1 + self.p) / 2, 1]
+        self.desired = [last * f for f in self.incr]
+        self.pos = [0]
+        for target in self.desired[1:4]:
+            # Keep marker positions strictly increasing
+            self.pos.append(min(max(round(target), self.pos[-1] + 1), last - (4 - len(self.pos))))
+        self.pos.append(last)
+        self.q = [values[i] for i in self.pos]
+        self.values = None
+
+    def finalize(self):
+        if self.invalid:
+            return None
+        if self.q is not None:
+            # The end markers track the exact minimum and maximum
+            return self.q[0] if self.p == 0 else self.q[4] if self.p == 1 else self.q[2]
+        if not self.values:
+            return None
+        values = sorted(self.values)
+        idx = self.p * (len(values) - 1)
+        lo = int(idx)
+        hi = min(lo + 1, len(values) - 1)
+        return values[lo] + (values[hi] - values[lo]) * (idx - lo)
+
+
+class _Median(_Quantile):
+    def step(self, value):
+        super().step(value, 0.5)
+
+
+def register_functions(conn):
+    """Register the project's SQL functions and aggregates on a connection."""
+    conn.create_function('POPCOUNT', 1, _popcount, deterministic=True)
+    conn.create_function('LECTURE_ATTENDED', 2, _lecture_attended, deterministic=True)
+    conn.create_function('ABSENCE_STREAK', 1, _absence_streak, deterministic=True)
+    conn.create_aggregate('VARIANCE', 1, _Variance)
+    conn.create_aggregate('STDDEV', 1, _Stddev)
+    conn.create_aggregate('VAR_POP', 1, _VariancePop)
+    conn.create_aggregate('STDDEV_POP', 1, _StddevPop)
+    conn.create_aggregate('MEDIAN', 1, _Median)
+    conn.create_aggregate('QUANTILE', 2, _Quantile)
+    return conn
@@ -0,0 +1,29 @@
+# Ingestion batches and per-stage watermarks (see migration 0004)
+
+
+def latest_batch(conn):
+    """ID of the most recent ingestion batch, or 0 for an empty database."""
+    return conn.execute("SELECT COALESCE(MAX(batch_id), 0) FROM ingestion_batches").fetchone()[0]
+
+
+def get_watermark(conn, stage):
+    """Last batch a stage has processed, or 0 if it never ran."""
+    row = conn.execute("SELECT batch_id FROM stage_watermarks WHERE stage = ?", (stage,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(conn, stage, batch_id):
+    """Record that `stage` has processed every batch up to `batch_id`."""
+    conn.execute("""
+        INSERT INTO stage_watermarks (stage, batch_id) VALUES (?, ?)
+        ON CONFLICT(stage) DO UPDATE SET batch_id = excluded.batch_id, updated_at = CURRENT_TIMESTAMP
+    """, (stage, batch_id))
+    conn.commit()
+
+
+def start_batch(conn, source, row_count=None):
+    """Register a new ingestion batch and return its ID (caller commits)."""
+    cursor = conn.execute(
+        "INSERT INTO ingestion_batches (source, row_count) VALUES (?, ?)", (source, row_count)
+    )
+    return cursor.lastrowid
@@ -0,0 +1,146 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_write
+from database.watermarks import get_watermark, set_watermark
+from models.registry import load_meta, load_latest, is_stale
+from models import kernels
+from models.features import load_features, matrix
+
+# Configuration
+DB_PATH = 'student_performance.db'
+CHUNK_SIZE = 100_000     # Score rows predicted and written per chunk
+REGRESSOR = 'score_predictor'
+CLASSIFIER = 'performance_classifier'
+PROB_COLUMNS = {'High': 'prob_high', 'Medium': 'prob_medium', 'Low': 'prob_low'}
+
+UPSERT_PREDICTIONS = f"""
+    INSERT INTO predictions (score_key, predicted_mark, predicted_group, {', '.join(PROB_COLUMNS.values())},
+                             regressor_version, classifier_version, batch_id)
+    VALUES ({', '.join('?' * (6 + len(PROB_COLUMNS)))})
+    ON CONFLICT(score_key) DO UPDATE SET
+        predicted_mark = excluded.predicted_mark,
+        predicted_group = excluded.predicted_group,
+        {', '.join(f'{c} = excluded.{c}' for c in PROB_COLUMNS.values())},
+        regressor_version = excluded.regressor_version,
+        classifier_version = excluded.classifier_version,
+        batch_id = excluded.batch_id,
+        predicted_at = CURRENT_TIMESTAMP
+"""
+
+
+def _load(name):
+    """Latest version of `name`: its NumPy kernel when exported, else the sklearn model."""
+    meta = load_meta(name)
+    if 'kernel' in meta:
+        try:
+            return kernels.load_kernel(name, meta['version'])
+        except ValueError:
+            pass
+    return load_latest(name)
+
+
+def _predict(loaded, X, method):
+    """Call `method` ('predict' or 'predict_proba') on the float64 feature block X."""
+    if isinstance(loaded, kernels.NumpyModel):
+        return getattr(kernels, method)(loaded, X)
+    if hasattr(loaded.model, 'feature_names_in_'):
+        # Fitted on a DataFrame: pass the same column names
+        import pandas as pd
+        X = pd.DataFrame(X, columns=loaded.meta['features'])
+    return getattr(loaded.model, method)(X)
+
+
+def _column(values, valid):
+    """Python list with None for rows that could not be scored."""
+    out = np.full(len(valid), None, dtype=object)
+    out[valid] = values
+    return out.tolist()
+
+
+def score_all(db_path=DB_PATH, chunk_size=CHUNK_SIZE, full=False):
+    """Predict mark and performance group for new score rows and upsert them into predictions.
+
+    Models with exported arrays run on the NumPy kernels (models/kernels.py),
+    so sklearn is only imported for model types without one.
+
+    Features come from the cached feature store (models/features.py). Only
+    rows from batches after the 'score' watermark are scored, unless the
+    latest model versions differ from the ones stored (or full=True), in
+    which case every row is rescored. Rows are processed in `chunk_size`
+    chunks; each chunk costs one predict and one predict_proba call and one
+    executemany. Everything is written in a single transaction. Rows with a
+    missing feature get NULL predictions.
+    """
+    print("Loading models...")
+    regressor = _load(REGRESSOR)
+    classifier = _load(CLASSIFIER)
+    versions = (regressor.meta['version'], classifier.meta['version'])
+    features = load_features(db_path)
+    batch = features.meta['data_version']['batch']
+
+    conn = connect_write(db_path)
+    for loaded in (regressor, classifier):
+        if is_stale(loaded.meta, conn):
+            print(f"Warning: {loaded.meta['name']} v{loaded.meta['version']} was trained on older data "
+                  f"(up to batch {loaded.meta['watermark']}), the database is at batch {batch}")
+
+    since = get_watermark(conn, 'score')
+    outdated = conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM predictions WHERE regressor_version != ? OR classifier_version != ?)", versions
+    ).fetchone()[0]
+    if full or outdated:
+        since = 0
+    print(f"Scoring rows from batches after {since} with {REGRESSOR} v{versions[0]} and {CLASSIFIER} v{versions[1]}...")
+
+    classes = classifier.meta['classes']
+    selected = np.flatnonzero(features.columns['batch_id'] > since)
+    start = time.perf_counter()
+    scored = 0
+    try:
+        for offset in range(0, len(selected), chunk_size):
+            rows = selected[offset:offset + chunk_size]
+            columns = {}
+            for name, loaded in (('regressor', regressor), ('classifier', classifier)):
+                X = matrix(features, loaded.meta['features'], rows)
+                valid = ~np.isnan(X).any(axis=1)
+                X = X[valid]
+                if name == 'regressor':
+                    columns['predicted_mark'] = _column(_predict(loaded, X, 'predict') if len(X) else [], valid)
+                else:
+                    proba = _predict(loaded, X, 'predict_proba') if len(X) else np.empty((0, len(classes)))
+                    columns['predicted_group'] = _column(np.asarray(classes, dtype=object)[proba.argmax(axis=1)], valid)
+                    for label, column in PROB_COLUMNS.items():
+                        columns[column] = (_column(proba[:, classes.index(label)], valid) if label in classes
+                                           else [None] * len(rows))
+
+            conn.executemany(UPSERT_PREDICTIONS, zip(
+                features.columns['score_key'][rows].tolist(), columns['predicted_mark'], columns['predicted_group'],
+                *(columns[c] for c in PROB_COLUMNS.values()),
+                [versions[0]] * len(rows), [versions[1]] * len(rows), features.columns['batch_id'][rows].tolist(),
+            ))
+            scored += len(rows)
+            print(f"  {scored} rows scored")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+
+    set_watermark(conn, 'score', batch)
+    conn.close()
+    print(f"Scored {scored} rows in {time.perf_counter() - start:.2f}s.")
+    return scored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write predictions of the latest models into the predictions table.")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database to score")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows predicted and written per chunk")
+    parser.add_argument('--full', action='store_true', help="Rescore every row, not just new batches")
+    args = parser.parse_args()
+    score_all(args.db, chunk_size=args.chunk_size, full=args.full)
@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_read
+
+# Configuration
+DB_PATH = 'student_performance.db'
+FEATURE_DIR = 'data/features'
+META_NAME = 'meta.json'
+CHUNK_SIZE = 100_000       # Rows read from SQLite per chunk while building
+KEEP_VERSIONS = 2          # Feature sets kept on disk (newest first)
+FEATURE_VERSION = 1        # Bump when a column definition changes; part of the cache key
+
+# Performance groups: Low (<70), Medium (70-85), High (>85)
+LABEL_BINS = [-np.inf, 70, 85, np.inf]
+LABELS = ['Low', 'Medium', 'High']
+
+# Column -> dtype of its .npy file; one-hot subjects are a separate (rows x subjects) matrix
+COLUMNS = {
+    'score_key': np.int64,
+    'batch_id': np.int32,
+    'total_attendance': np.int8,
+    'exam_1': np.float64,
+    'exam_2': np.float64,
+    'exam_3': np.float64,
+    'total_mark': np.float64,
+    'gender_code': np.float32,   # Male 0, Female 1, NaN when unknown
+    'subject_key': np.int16,
+    'performance_group': np.int8,  # Code into LABELS
+}
+
+FEATURE_QUERY = """
+    SELECT
+        sc.score_key,
+        sc.batch_id,
+        sc.total_attendance,
+        sc.exam_1,
+        sc.exam_2,
+        sc.exam_3,
+        sc.total_mark,
+        st.gender,
+        sc.subject_key
+    FROM scores sc
+    JOIN students st ON sc.student_key = st.student_key
+    ORDER BY sc.score_key
+"""
+
+# A materialized feature matrix: column name -> memory-mapped array, plus its meta.json
+FeatureSet = namedtuple('FeatureSet', ['columns', 'meta'])
+
+
+def data_version(conn):
+    """What the features depend on: latest batch, row count and when that batch landed.
+
+    Every ingest and every generate adds a batch, and batch IDs are never
+    reused (migration 0008), so any change to scores or students changes this.
+    """
+    batch, ingested_at = conn.execute(
+        "SELECT batch_id, ingested_at FROM ingestion_batches ORDER BY batch_id DESC LIMIT 1"
+    ).fetchone() or (0, None)
+    rows, max_key = conn.execute("SELECT COUNT(*), COALESCE(MAX(score_key), 0) FROM scores").fetchone()
+    return {'batch': batch, 'ingested_at': ingested_at, 'rows': rows, 'max_score_key': max_key,
+            'feature_version': FEATURE_VERSION}
+
+
+def descends_from(conn, version):
+    """True when the database still holds the batch `version` was taken at, i.e. it has only grown since.
+
+    A regenerated database has dropped that batch, and batch IDs are never
+    reused, so this tells appended data from replaced data.
+    """
+    row = conn.execute("SELECT ingested_at FROM ingestion_batches WHERE batch_id = ?", (version['batch'],)).fetchone()
+    return row is not None and row[0] == version['ingested_at']
+
+
+def feature_key(version):
+    return f"b{version['batch']:05d}-" + hashlib.sha256(json.dumps(version, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _build(conn, path, version, chunk_size):
+    """Stream the feature query into preallocated .npy files under `path`."""
+    import pandas as pd
+    subjects = conn.execute("SELECT subject_key, subject_name FROM subjects ORDER BY subject_key").fetchall()
+    position = np.full(max([key for key, _ in subjects], default=0) + 1, -1, dtype=np.int64)
+    position[[key for key, _ in subjects]] = np.arange(len(subjects))
+    rows = conn.execute(
+        "SELECT COUNT(*) FROM scores sc JOIN students st ON sc.student_key = st.student_key"
+    ).fetchone()[0]
+
+    out = {name: np.lib.format.open_memmap(os.path.join(path, f'{name}.npy'), mode='w+', dtype=dtype, shape=(rows,))
+           for name, dtype in COLUMNS.items()}
+    onehot = np.lib.format.open_memmap(os.path.join(path, 'subject_onehot.npy'), mode='w+',
+                                       dtype=np.uint8, shape=(rows, len(subjects)))
+    start = 0
+    for chunk in pd.read_sql_query(FEATURE_QUERY, conn, chunksize=chunk_size):
+        if chunk.empty:
+            # An empty result still yields one chunk, with untyped (object) columns
+            continue
+        stop = start + len(chunk)
+        for name in ('score_key', 'batch_id', 'total_attendance', 'exam_1', 'exam_2', 'exam_3', 'total_mark', 'subject_key'):
+            out[name][start:stop] = chunk[name].to_numpy()
+        out['gender_code'][start:stop] = chunk['gender'].map({'Male': 0, 'Female': 1}).to_numpy(dtype=np.float32)
+        # -1 when the mark is missing
+        out['performance_group'][start:stop] = pd.cut(
+            chunk['total_mark'], LABEL_BINS, right=False, labels=False
+        ).fillna(-1).to_numpy(dtype=np.int8)
+        onehot[np.arange(start, stop), position[chunk['subject_key'].to_numpy(dtype=np.int64)]] = 1
+        start = stop
+    for array in [*out.values(), onehot]:
+        array.flush()
+
+    meta = {
+        'key': feature_key(version),
+        'data_version': version,
+        'rows': rows,
+        'columns': {name: np.dtype(dtype).name for name, dtype in COLUMNS.items()},
+        'subjects': [name for _, name in subjects],
+        'labels': LABELS,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(os.path.join(path, META_NAME), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _prune(store_dir, keep):
+    """Drop all but the `keep` newest feature sets."""
+    entries = sorted((e for e in os.listdir(store_dir) if e.startswith('b')),
+                     key=lambda e: os.path.getmtime(os.path.join(store_dir, e)), reverse=True)
+    for entry in entries[keep:]:
+        shutil.rmtree(os.path.join(store_dir, entry), ignore_errors=True)
+
+
+def load_features(db_path=DB_PATH, store_dir=FEATURE_DIR, chunk_size=CHUNK_SIZE, rebuild=False):
+    """Feature matrix for the database's current data version, building it on first use.
+
+    Columns are typed .npy files memory-mapped read-only, so training,
+    tuning and scoring share one materialization (and its page cache)
+    until the data changes. A new set is built in a temporary directory
+    and renamed into place, so concurrent readers never see a partial one.
+    """
+    conn = connect_read(db_path)
+    try:
+        # One read transaction: the version and the rows it describes come from the same snapshot
+        conn.execute("BEGIN")
+        version = data_version(conn)
+        key = feature_key(version)
+        path = os.path.join(store_dir, key)
+        if rebuild or not os.path.exists(os.path.join(path, META_NAME)):
+            os.makedirs(store_dir, exist_ok=True)
+            print(f"Building feature set {key} ({version['rows']} rows)...")
+            start = time.perf_counter()
+            staging = tempfile.mkdtemp(prefix=f'.{key}-', dir=store_dir)
+            try:
+                os.chmod(staging, 0o755)
+                _build(conn, staging, version, chunk_size)
+                shutil.rmtree(path, ignore_errors=True)
+                os.rename(staging, path)
+            except OSError:
+                # Another process published the same key first; use theirs
+                shutil.rmtree(staging, ignore_errors=True)
+                if not os.path.exists(os.path.join(path, META_NAME)):
+                    raise
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            print(f"Feature set built in {time.perf_counter() - start:.2f}s.")
+            _prune(store_dir, KEEP_VERSIONS)
+    finally:
+        conn.close()
+
+    with open(os.path.join(path, META_NAME)) as f:
+        meta = json.load(f)
+    columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+               for name in [*meta['columns'], 'subject_onehot']}
+    return FeatureSet(columns, meta)
+
+
+def subject_columns(features):
+    """Names of the one-hot subject columns, e.g. subject_Mathematics."""
+    return [f"subject_{name.replace(' ', '_')}" for name in features.meta['subjects']]
+
+
+def feature_frame(features, rows=None):
+    """DataFrame of every column (optionally only `rows`), with labels decoded and subjects one-hot."""
+    import pandas as pd
+    index = slice(None) if rows is None else rows
+    df = pd.DataFrame({name: np.asarray(features.columns[name][index]) for name in features.meta['columns']})
+    df['performance_group'] = pd.Categorical.from_codes(df['performance_group'], features.meta['labels']).astype(object)
+    onehot = np.asarray(features.columns['subject_onehot'][index])
+    for i, name in enumerate(subject_columns(features)):
+        df[name] = onehot[:, i]
+    return df
+
+
+def matrix(features, names, rows=None):
+    """float64 (rows x len(names)) array of plain or one-hot columns."""
+    index = slice(None) if rows is None else rows
+    onehot = dict(zip(subject_columns(features), range(len(features.meta['subjects']))))
+    out = [features.columns['subject_onehot'][index, onehot[name]] if name in onehot else features.columns[name][index]
+           for name in names]
+    return np.column_stack(out).astype(np.float64) if out else np.empty((0, 0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the cached feature matrix.")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database to read")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild even if the data version is cached")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows read per chunk while building")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    features = load_features(args.db, chunk_size=args.chunk_size, rebuild=args.rebuild)
+    print(f"Feature set {features.meta['key']}: {features.meta['rows']} rows, "
+          f"{len(features.meta['columns']) + len(features.meta['subjects'])} columns "
+          f"({time.perf_counter() - start:.2f}s)")
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_read, connect_write
+from database.watermarks import set_watermark
+from models.features import LABEL_BINS, LABELS, data_version, descends_from
+from models.registry import save_model, load_latest, list_versions, frame_hash
+from models.train_model import DB_PATH, REGRESSION_FEATURES, CLASSIFIER_FEATURES
+
+# Configuration
+CHUNK_SIZE = 50_000                  # Rows streamed from SQLite per partial_fit call
+CLASSES = ['High', 'Low', 'Medium']  # partial_fit must see every label on its first call
+SEED = 42
+
+# Model name -> (problem, features, target); kept apart from the batch-trained models
+ONLINE_MODELS = {
+    'score_predictor_online': ('regression', REGRESSION_FEATURES, 'total_mark'),
+    'performance_classifier_online': ('classification', CLASSIFIER_FEATURES, 'performance_group'),
+}
+
+STREAM_QUERY = """
+    SELECT
+        sc.batch_id,
+        sc.total_attendance,
+        sc.exam_1,
+        sc.exam_2,
+        sc.total_mark,
+        st.gender
+    FROM scores sc
+    JOIN students st ON sc.student_key = st.student_key
+    WHERE sc.batch_id > ?
+    ORDER BY sc.score_key
+"""
+
+
+def _new_model(problem):
+    """Untrained estimator that supports partial_fit."""
+    if problem == 'regression':
+        # SGD needs scaled inputs; the scaler's running mean/variance is updated per chunk too
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.linear_model import SGDRegressor
+        return make_pipeline(StandardScaler(), SGDRegressor(random_state=SEED))
+    # Gaussian naive Bayes keeps exact per-class sums, so incremental updates equal a full refit
+    from sklearn.naive_bayes import GaussianNB
+    return GaussianNB()
+
+
+def _partial_fit(model, problem, X, y):
+    if hasattr(model, 'steps'):
+        scaler, estimator = model.steps[0][1], model.steps[-1][1]
+        scaler.partial_fit(X)
+        X = scaler.transform(X)
+    else:
+        estimator = model
+    if problem == 'classification':
+        estimator.partial_fit(X, y, classes=CLASSES)
+    else:
+        estimator.partial_fit(X, y)
+
+
+def _stream(conn, since, chunk_size):
+    """Score rows from batches after `since`, in score_key order, as DataFrame chunks."""
+    import pandas as pd
+    for chunk in pd.read_sql_query(STREAM_QUERY, conn, params=(since,), chunksize=chunk_size):
+        chunk['gender_code'] = chunk['gender'].map({'Male': 0, 'Female': 1})
+        # Same bins as the feature store; NaN when the mark is missing
+        chunk['performance_group'] = pd.cut(chunk['total_mark'], LABEL_BINS, right=False, labels=LABELS).astype(object)
+        yield chunk
+
+
+def update_models(db_path=DB_PATH, refit=False, chunk_size=CHUNK_SIZE):
+    """Bring the online models up to the latest batch, reading only rows they have not seen.
+
+    Each model resumes from its latest registry version and its watermark;
+    rows from newer batches are streamed once, in chunks, and fed to
+    partial_fit, so the cost follows the new data rather than the history.
+    Before each chunk updates a model it is scored on that chunk
+    (progressive validation), which gives metrics without a holdout.
+
+    A model whose watermark batch is no longer in the database (it was
+    regenerated) is refit from all rows. Scores re-stamped by an upsert are
+    learned again on top of their old values, so run with refit=True
+    periodically to start over.
+    """
+    conn = connect_read(db_path)
+    version = data_version(conn)
+    batch = version['batch']
+    if batch == 0:
+        print("No data found!")
+        conn.close()
+        return
+
+    # 1. Resume each model from its latest version (or start a new one)
+    states = {}
+    for name, (problem, features, target) in ONLINE_MODELS.items():
+        previous = None
+        if not refit and list_versions(name):
+            # Loaded into memory, not mapped, because partial_fit updates the arrays in place
+            previous = load_latest(name, mmap_mode=None)
+            known = previous.meta.get('data_version')
+            if not known or not descends_from(conn, known):
+                print(f"{name}: v{previous.meta['version']} was trained on a replaced database, refitting from scratch")
+                previous = None
+        since = previous.meta['watermark'] if previous else 0
+        if since >= batch:
+            print(f"{name} v{previous.meta['version']} is up to date (batch {batch})")
+            continue
+        states[name] = {
+            'model': previous.model if previous else _new_model(problem),
+            'fitted': previous is not None,
+            'since': since,
+            'rows': previous.meta['rows'] if previous else 0,
+            'new_rows': 0,
+            'loss': 0.0,
+            'scored': 0,
+            'hash': hashlib.sha256((previous.meta['data_hash'] if previous else '').encode()),
+            'seconds': 0.0,
+        }
+
+    if not states:
+        conn.close()
+        return
+
+    # 2. One pass over the rows newer than the oldest watermark, shared by all models
+    since = min(state['since'] for state in states.values())
+    print(f"Streaming scores from batches after {since} (latest: {batch})...")
+    for chunk in _stream(conn, since, chunk_size):
+        for name, state in states.items():
+            problem, features, target = ONLINE_MODELS[name]
+            rows = chunk[chunk['batch_id'] > state['since']].dropna(subset=features + [target])
+            if rows.empty:
+                continue
+            X = rows[features].to_numpy(dtype=np.float64)
+            y = rows[target].to_numpy()
+
+            start = time.perf_counter()
+            if state['fitted']:
+                predicted = state['model'].predict(X)
+                if problem == 'regression':
+                    state['loss'] += float(np.sum((predicted - y) ** 2))
+                else:
+                    state['loss'] += float(np.sum(predicted == y))
+                state['scored'] += len(rows)
+            _partial_fit(state['model'], problem, X, y)
+            state['seconds'] += time.perf_counter() - start
+            state['fitted'] = True
+            state['new_rows'] += len(rows)
+            state['hash'].update(frame_hash(rows[features + [target]]).encode())
+    conn.close()
+
+    # 3. Save every updated model as a new registry version
+    for name, state in states.items():
+        problem, features, target = ONLINE_MODELS[name]
+        if state['new_rows'] == 0:
+            print(f"{name}: no new rows since batch {state['since']}")
+            continue
+        metric = 'progressive_mse' if problem == 'regression' else 'progressive_accuracy'
+        metrics = {metric: state['loss'] / state['scored'] if state['scored'] else None,
+                   'scored_rows': state['scored']}
+        meta = save_model(
+            name, state['model'], features, batch, metrics, state['seconds'], state['hash'].hexdigest(),
+            rows=state['rows'] + state['new_rows'], target=target,
+            params={'mode': 'refit' if state['since'] == 0 else 'incremental',
+                    'since_batch': state['since'], 'new_rows': state['new_rows']},
+            data_version=version,
+        )
+        print(f"Saved {name} v{meta['version']}: {state['new_rows']} new rows in {state['seconds']:.2f}s, {metrics}")
+
+    conn = connect_write(db_path)
+    set_watermark(conn, 'train_incremental', batch)
+    conn.close()
@@ -0,0 +1,163 @@
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.registry import REGISTRY_DIR, load_arrays, load_model, export_version
+
+# Configuration
+DB_PATH = 'student_performance.db'
+MODELS = ['score_predictor', 'performance_classifier']
+
+# A registry version in array form: kernel name, its (memory-mapped) arrays and the sidecar
+NumpyModel = namedtuple('NumpyModel', ['kernel', 'arrays', 'meta'])
+
+
+def load_kernel(name, version=None, registry_dir=REGISTRY_DIR):
+    """Load a version (default: latest) of `name` as a NumpyModel; sklearn is not imported."""
+    arrays, meta = load_arrays(name, version, registry_dir)
+    if 'kernel' not in meta or ('missing_go_to_left' not in arrays and meta['kernel'].startswith('forest')):
+        raise ValueError(f"Model '{name}' v{meta['version']} predates the kernels; "
+                         f"run `python models/kernels.py export {name}`")
+    # Plain ndarray views of the mapped files: same pages, without np.memmap's per-slice overhead
+    arrays = {key: array.view(np.ndarray) for key, array in arrays.items()}
+    if meta['kernel'].startswith('forest'):
+        # Children interleaved as [left, right] pairs, so one gather picks the branch
+        arrays['children'] = np.stack([arrays['children_left'], arrays['children_right']], axis=1).ravel()
+    return NumpyModel(meta['kernel'], arrays, meta)
+
+
+def _tree_leaves(X, feature, threshold, children, missing_go_to_left):
+    """Leaf reached by each row of float32 X in one tree (local node indices).
+
+    All rows descend one level per iteration and drop out once they reach a
+    leaf. The split test mirrors sklearn's: the float32 value against the
+    float64 threshold, NaN sent to the missing_go_to_left side.
+    """
+    n, n_features = X.shape
+    index = np.int32 if X.size < 2**31 else np.intp
+    leaves = np.zeros(n, dtype=index)
+    if feature[0] < 0:
+        return leaves
+    flat = X.ravel()
+    has_nan = np.isnan(flat).any()
+    rows = np.arange(n, dtype=index)
+    offsets = rows * n_features
+    node = np.zeros(n, dtype=index)
+    node_feature = np.full(n, feature[0], dtype=index)
+    while rows.size:
+        x = flat.take(offsets + node_feature)
+        go_right = x > threshold.take(node)
+        if has_nan:
+            go_right = np.where(np.isnan(x), ~missing_go_to_left.take(node), go_right)
+        node = children.take(2 * node + go_right)
+        node_feature = feature.take(node)
+        inner = node_feature >= 0
+        if not inner.all():
+            done = ~inner
+            leaves[rows[done]] = node[done]
+            rows, offsets, node, node_feature = rows[inner], offsets[inner], node[inner], node_feature[inner]
+    return leaves
+
+
+def _forest(model, X):
+    """Mean leaf value over the trees, accumulated tree by tree in sklearn's order."""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    a = model.arrays
+    offsets = a['tree_offsets']
+    out = np.zeros((len(X), a['value'].shape[1]))
+    for lo, hi in zip(offsets[:-1], offsets[1:]):
+        # Each tree's slice of the node table is small enough to stay in cache
+        leaves = _tree_leaves(X, a['feature'][lo:hi], a['threshold'][lo:hi], a['children'][2 * lo:2 * hi],
+                              a['missing_go_to_left'][lo:hi])
+        out += a['value'][lo:hi].take(leaves, axis=0)
+    out /= len(offsets) - 1
+    return out
+
+
+def predict(model, X):
+    """Same values as the sklearn model's predict(X)."""
+    if model.kernel == 'linear':
+        return np.asarray(X, dtype=np.float64) @ model.arrays['coef'] + model.arrays['intercept']
+    if model.kernel == 'forest_regressor':
+        return _forest(model, X)[:, 0]
+    classes = np.asarray(model.meta['classes'], dtype=object)
+    return classes[predict_proba(model, X).argmax(axis=1)]
+
+
+def predict_proba(model, X):
+    """Same values as the sklearn classifier's predict_proba(X); columns follow meta['classes']."""
+    if model.kernel != 'forest_classifier':
+        raise ValueError(f"Model '{model.meta['name']}' is not a classifier")
+    return _forest(model, X)
+
+
+def verify(db_path=DB_PATH, names=MODELS):
+    """Compare kernel and sklearn outputs on the training test split and time both loads.
+
+    Forests are evaluated with n_jobs=1: threaded sklearn sums the trees in
+    whatever order the threads finish, so only the sequential order is
+    reproducible bit for bit.
+    """
+    loaded = {}
+    for name in names:
+        start = time.perf_counter()
+        kernel = load_kernel(name)
+        kernel_ms = (time.perf_counter() - start) * 1000
+        # The first load includes importing sklearn, as it would for any fresh consumer
+        start = time.perf_counter()
+        sk = load_model(name, kernel.meta['version'])
+        loaded[name] = (kernel, sk.model, kernel_ms, (time.perf_counter() - start) * 1000)
+
+    from sklearn.model_selection import train_test_split
+    from models.train_model import load_training_frame
+    df, _ = load_training_frame(db_path)
+    _, test_idx = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    test = df.iloc[test_idx]
+
+    identical = True
+    for name, (kernel, model, kernel_ms, sklearn_ms) in loaded.items():
+        features = kernel.meta['features']
+        X = test[features].to_numpy(dtype=np.float64)
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+        outputs = [('predict', predict, model.predict)]
+        if kernel.kernel == 'forest_classifier':
+            outputs.append(('predict_proba', predict_proba, model.predict_proba))
+
+        print(f"{name} v{kernel.meta['version']} ({kernel.kernel}, {len(X)} test rows)")
+        print(f"    load: kernel {kernel_ms:.1f} ms, sklearn {sklearn_ms:.1f} ms")
+        for label, kernel_fn, sklearn_fn in outputs:
+            start = time.perf_counter()
+            ours = kernel_fn(kernel, X)
+            kernel_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            theirs = sklearn_fn(test[features] if hasattr(model, 'feature_names_in_') else X)
+            sklearn_ms = (time.perf_counter() - start) * 1000
+            same = np.array_equal(ours, theirs)
+            identical &= same
+            print(f"    {label}: kernel {kernel_ms:.1f} ms, sklearn {sklearn_ms:.1f} ms, "
+                  f"{'bit-identical' if same else 'MISMATCH'}")
+    return identical
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NumPy inference kernels for the registry models.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help="Write kernel arrays for versions saved without them")
+    export_parser.add_argument('names', nargs='*', default=MODELS, help="Models to export (default: both)")
+    export_parser.add_argument('--version', type=int, default=None, help="Version to export (default: latest)")
+    verify_parser = subparsers.add_parser('verify', help="Check kernels against sklearn on the test split")
+    verify_parser.add_argument('names', nargs='*', default=MODELS, help="Models to check (default: both)")
+    verify_parser.add_argument('--db', default=DB_PATH, help="SQLite database holding the training data")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        for name in args.names:
+            meta = export_version(name, args.version)
+            print(f"Exported {name} v{meta['version']} as {meta['kernel']} ({', '.join(meta['arrays'])})")
+    elif not verify(args.db, args.names):
+        sys.exit(1)
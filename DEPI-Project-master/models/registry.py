@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.watermarks import latest_batch
+from models.features import data_version
+
+# Configuration
+REGISTRY_DIR = 'models/registry'
+ARTIFACT_NAME = 'model.joblib'
+META_NAME = 'meta.json'
+REPORT_NAME = 'report.json'
+ARRAYS_DIR = 'arrays'
+
+# Layout: <REGISTRY_DIR>/<model name>/v0001/{model.joblib, meta.json, report.json, arrays/*.npy}
+# A version directory is written under a temporary name and renamed into place,
+# so readers never see a half-written model.
+LoadedModel = namedtuple('LoadedModel', ['model', 'meta'])
+
+
+def frame_hash(df):
+    """Content hash of a training DataFrame (values, index and column names)."""
+    import pandas as pd
+    h = hashlib.sha256()
+    h.update(repr(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _forest_arrays(model):
+    """Node tables of every tree in a fitted forest, concatenated into flat arrays.
+
+    Tree t owns nodes tree_offsets[t]:tree_offsets[t + 1]; child indices are
+    local to their tree (-1 marks a leaf). sklearn copies its trees into
+    private memory when unpickling, so these flat copies are what can be
+    memory-mapped.
+    """
+    import numpy as np
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    return {
+        'tree_offsets': np.cumsum([0] + [tree.node_count for tree in trees]).astype(np.int64),
+        'children_left': np.concatenate([tree.children_left for tree in trees]).astype(np.int32),
+        'children_right': np.concatenate([tree.children_right for tree in trees]).astype(np.int32),
+        'feature': np.concatenate([tree.feature for tree in trees]).astype(np.int32),
+        'threshold': np.concatenate([tree.threshold for tree in trees]),
+        'missing_go_to_left': np.concatenate([tree.missing_go_to_left for tree in trees]).astype(bool),
+        'value': np.concatenate([tree.value[:, 0, :] for tree in trees]),
+    }
+
+
+def export_arrays(model):
+    """(kernel name, flat arrays) for models models/kernels.py can evaluate, else (None, None).
+
+    Supported: single-output random forests (node tables above) and linear
+    regressors (coef, intercept).
+    """
+    import numpy as np
+    if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_') and model.n_outputs_ == 1:
+        return ('forest_classifier' if hasattr(model, 'classes_') else 'forest_regressor'), _forest_arrays(model)
+    if hasattr(model, 'coef_') and hasattr(model, 'intercept_') and not hasattr(model, 'classes_') \
+            and np.ndim(model.coef_) == 1:
+        return 'linear', {
+            'coef': np.asarray(model.coef_, dtype=np.float64),
+            'intercept': np.atleast_1d(np.asarray(model.intercept_, dtype=np.float64)),
+        }
+    return None, None
+
+
+def write_arrays(path, arrays):
+    """Save each array as <path>/<key>.npy."""
+    import numpy as np
+    os.makedirs(path, exist_ok=True)
+    for key, array in arrays.items():
+        np.save(os.path.join(path, f'{key}.npy'), array)
+
+
+def _model_dir(name, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, name)
+
+
+def list_versions(name, registry_dir=REGISTRY_DIR):
+    """Saved version numbers of `name`, oldest first."""
+    path = _model_dir(name, registry_dir)
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(entry[1:]) for entry in os.listdir(path) if entry.startswith('v') and entry[1:].isdigit())
+
+
+def save_model(name, model, features, watermark, metrics, training_seconds, data_hash,
+               rows=None, target=None, params=None, report=None, data_version=None, registry_dir=REGISTRY_DIR):
+    """Store `model` as the next version of `name` and return its metadata.
+
+    `report` (e.g. a hyperparameter search log) is saved next to the sidecar.
+    `data_version` (models.features.data_version of the training data) is
+    what is_stale compares against the database.
+
+    The artifact is an uncompressed joblib dump, so its NumPy arrays (e.g.
+    the node tables of every tree in a random forest) can be memory-mapped
+    on load instead of copied. Forests and linear regressors are also
+    exported as flat arrays (see export_arrays) for the NumPy kernels.
+    """
+    import joblib
+    import sklearn
+
+    base = _model_dir(name, registry_dir)
+    os.makedirs(base, exist_ok=True)
+    versions = list_versions(name, registry_dir)
+    version = versions[-1] + 1 if versions else 1
+
+    meta = {
+        'name': name,
+        'version': version,
+        'model_class': f"{type(model).__module__}.{type(model).__name__}",
+        'features': list(features),
+        'target': target,
+        'watermark': watermark,
+        'data_version': data_version,
+        'rows': rows,
+        'metrics': metrics,
+        'params': params or {},
+        'training_seconds': round(training_seconds, 3),
+        'data_hash': data_hash,
+        'sklearn_version': sklearn.__version__,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    if hasattr(model, 'classes_'):
+        meta['classes'] = [c.item() if hasattr(c, 'item') else c for c in model.classes_]
+    kernel, arrays = export_arrays(model)
+
+    staging = tempfile.mkdtemp(prefix=f'.{name}-', dir=base)
+    try:
+        os.chmod(staging, 0o755)
+        joblib.dump(model, os.path.join(staging, ARTIFACT_NAME))
+        if kernel is not None:
+            write_arrays(os.path.join(staging, ARRAYS_DIR), arrays)
+            meta['kernel'] = kernel
+            meta['arrays'] = sorted(arrays)
+        if report is not None:
+            meta['report'] = REPORT_NAME
+            with open(os.path.join(staging, REPORT_NAME), 'w') as f:
+                json.dump(report, f, indent=2)
+        with open(os.path.join(staging, META_NAME), 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.rename(staging, os.path.join(base, f'v{version:04d}'))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return meta
+
+
+def load_meta(name, version=None, registry_dir=REGISTRY_DIR):
+    """Sidecar metadata of a version (default: latest) without loading the model."""
+    versions = list_versions(name, registry_dir)
+    if not versions:
+        raise FileNotFoundError(f"No saved versions of model '{name}' in {registry_dir}")
+    version = versions[-1] if version is None else version
+    with open(os.path.join(_model_dir(name, registry_dir), f'v{version:04d}', META_NAME)) as f:
+        return json.load(f)
+
+
+def load_model(name, version=None, mmap_mode='r', registry_dir=REGISTRY_DIR):
+    """Load a version (default: latest) of `name` as a LoadedModel(model, meta).
+
+    With mmap_mode='r' the model's arrays are mapped read-only from disk, so
+    loading takes milliseconds and processes share the pages.
+    """
+    import joblib
+    meta = load_meta(name, version, registry_dir)
+    path = os.path.join(_model_dir(name, registry_dir), f"v{meta['version']:04d}", ARTIFACT_NAME)
+    return LoadedModel(joblib.load(path, mmap_mode=mmap_mode), meta)
+
+
+def load_arrays(name, version=None, registry_dir=REGISTRY_DIR):
+    """Memory-mapped flat arrays of a version (see export_arrays) and its meta."""
+    import numpy as np
+    meta = load_meta(name, version, registry_dir)
+    if 'arrays' not in meta:
+        raise ValueError(f"Model '{name}' v{meta['version']} has no exported arrays")
+    path = os.path.join(_model_dir(name, registry_dir), f"v{meta['version']:04d}", ARRAYS_DIR)
+    arrays = {key: np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r') for key in meta['arrays']}
+    return arrays, meta
+
+
+def export_version(name, version=None, registry_dir=REGISTRY_DIR):
+    """Write (or refresh) the flat arrays of an already saved version and return its meta.
+
+    For versions saved before their model type had a NumPy kernel. The
+    arrays are staged and renamed into place before meta.json is replaced.
+    """
+    meta = load_meta(name, version, registry_dir)
+    kernel, arrays = export_arrays(load_model(name, meta['version'], None, registry_dir).model)
+    if kernel is None:
+        raise ValueError(f"No NumPy kernel for {meta['model_class']}")
+    path = os.path.join(_model_dir(name, registry_dir), f"v{meta['version']:04d}")
+
+    staging = tempfile.mkdtemp(prefix=f'.{ARRAYS_DIR}-', dir=path)
+    try:
+        os.chmod(staging, 0o755)
+        write_arrays(staging, arrays)
+        shutil.rmtree(os.path.join(path, ARRAYS_DIR), ignore_errors=True)
+        os.rename(staging, os.path.join(path, ARRAYS_DIR))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    meta['kernel'] = kernel
+    meta['arrays'] = sorted(arrays)
+    with open(os.path.join(path, META_NAME + '.tmp'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(path, META_NAME + '.tmp'), os.path.join(path, META_NAME))
+    return meta
+
+
+def load_latest(name, mmap_mode='r', registry_dir=REGISTRY_DIR):
+    """Latest version of `name` as a LoadedModel(model, meta)."""
+    return load_model(name, None, mmap_mode, registry_dir)
+
+
+def is_stale(meta, conn):
+    """True when the database no longer holds exactly the data the model was trained on.
+
+    Compares the data version stored at training time, so new batches,
+    upserts and a regenerated database all count. Versions saved without
+    one fall back to the batch watermark.
+    """
+    if meta.get('data_version'):
+        return data_version(conn) != meta['data_version']
+    return latest_batch(conn) > meta['watermark']
@@ -1,96 +1,123 @@
-import sqlite3
-import pandas as pd
-import pickle
+import argparse
 import os
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import mean_squared_error, accuracy_score, classification_report
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_write
+from database.watermarks import set_watermark
+from models.registry import save_model, frame_hash
+from models.features import load_features, feature_frame
 
 # Configuration
 DB_PATH = 'student_performance.db'
 MODEL_DIR = 'models'
+REGRESSION_FEATURES = ['total_attendance', 'exam_1', 'exam_2']
+CLASSIFIER_FEATURES = ['total_attendance', 'gender_code', 'exam_1']
+
+def load_training_frame(db_path=DB_PATH):
+    """Training rows from the cached feature store, and the data version they reflect.
+
+    Features (attendance, exams, gender code, one-hot subjects) and the
+    performance_group labels are materialized once per data version by
+    models/features.py and shared with tuning and batch scoring.
+    """
+    features = load_features(db_path)
+    return feature_frame(features), features.meta['data_version']
 
 def train_models():
+    # scikit-learn takes ~2s to import, so load it only when actually training
+    from sklearn.model_selection import train_test_split
+    from sklearn.linear_model import LinearRegression
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import mean_squared_error, accuracy_score, classification_report
+
     print("Training ML models...")
-    conn = sqlite3.connect(DB_PATH)
-    
-    # Load data
-    # We want to predict total_mark based on attendance and individual exams (simulating predicting final from partials)
-    # Or predict performance category based on demographics and attendance
-    query = """
-    SELECT 
-        sc.total_attendance,
-        sc.exam_1,
-        sc.exam_2,
-        sc.exam_3,
-        sc.total_mark,
-        st.gender,
-        s.subject_name
-    FROM scores sc
-    JOIN students st ON sc.student_id = st.student_id
-    JOIN subjects s ON sc.subject_id = s.subject_id
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    df, version = load_training_frame(DB_PATH)
+    batch = version['batch']
 
     if df.empty:
         print("No data found!")
         return
-
-    # Preprocessing
-    # Convert categorical to numeric
-    df['gender_code'] = df['gender'].map({'Male': 0, 'Female': 1})
-    # One-hot encode subjects? For simplicity, let's just use numeric features for regression
     
     # --- Model 1: Regression (Predict Total Mark) ---
     # Features: Attendance, Exam 1, Exam 2 (Predicting Final based on partials + attendance)
-    X_reg = df[['total_attendance', 'exam_1', 'exam_2']]
+    X_reg = df[REGRESSION_FEATURES]
     y_reg = df['total_mark']
     
     X_train_r, X_test_r, y_train_r, y_test_r = train_test_split(X_reg, y_reg, test_size=0.2, random_state=42)
     
+    start = time.perf_counter()
     reg_model = LinearRegression()
     reg_model.fit(X_train_r, y_train_r)
+    reg_seconds = time.perf_counter() - start
     
     y_pred_r = reg_model.predict(X_test_r)
     mse = mean_squared_error(y_test_r, y_pred_r)
     print(f"Regression Model MSE: {mse:.2f}")
     
-    # Save Regression Model
-    with open(os.path.join(MODEL_DIR, 'score_predictor.pkl'), 'wb') as f:
-        pickle.dump(reg_model, f)
+    # Save Regression Model as the next registry version
+    meta = save_model(
+        'score_predictor', reg_model, REGRESSION_FEATURES, batch, {'mse': mse}, reg_seconds,
+        frame_hash(df[REGRESSION_FEATURES + ['total_mark']]), rows=len(X_train_r), target='total_mark',
+        data_version=version,
+    )
+    print(f"Saved score_predictor v{meta['version']}")
         
     # --- Model 2: Classification (Predict Performance Group) ---
-    # Low (<70), Medium (70-85), High (>85)
-    def categorize(score):
-        if score < 70: return 'Low'
-        elif score < 85: return 'Medium'
-        else: return 'High'
-        
-    df['performance_group'] = df['total_mark'].apply(categorize)
-    
+    # Low (<70), Medium (70-85), High (>85), see features.LABEL_BINS
     # Features: Attendance, Gender Code
-    X_clf = df[['total_attendance', 'gender_code', 'exam_1']]
+    X_clf = df[CLASSIFIER_FEATURES]
     y_clf = df['performance_group']
     
     X_train_c, X_test_c, y_train_c, y_test_c = train_test_split(X_clf, y_clf, test_size=0.2, random_state=42)
     
+    start = time.perf_counter()
     clf_model = RandomForestClassifier(n_estimators=100, random_state=42)
     clf_model.fit(X_train_c, y_train_c)
+    clf_seconds = time.perf_counter() - start
     
     y_pred_c = clf_model.predict(X_test_c)
     acc = accuracy_score(y_test_c, y_pred_c)
     print(f"Classification Model Accuracy: {acc:.2f}")
     print(classification_report(y_test_c, y_pred_c))
     
-    # Save Classification Model
-    with open(os.path.join(MODEL_DIR, 'performance_classifier.pkl'), 'wb') as f:
-        pickle.dump(clf_model, f)
+    # Save Classification Model as the next registry version
+    meta = save_model(
+        'performance_classifier', clf_model, CLASSIFIER_FEATURES, batch, {'accuracy': acc}, clf_seconds,
+        frame_hash(df[CLASSIFIER_FEATURES + ['performance_group']]), rows=len(X_train_c), target='performance_group',
+        params={'n_estimators': 100, 'random_state': 42}, data_version=version,
+    )
+    print(f"Saved performance_classifier v{meta['version']}")
+
+    # Models now reflect every batch up to `batch`
+    conn = connect_write(DB_PATH)
+    set_watermark(conn, 'train', batch)
+    conn.close()
 
     print("Models saved.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the score predictor and performance classifier.")
+    parser.add_argument('--tune', action='store_true', help="Run a parallel hyperparameter search instead of fixed settings")
+    parser.add_argument('--budget', type=float, default=600, help="Wall-clock seconds for --tune (refits included)")
+    parser.add_argument('--jobs', type=int, default=None, help="Worker processes for --tune (default: all cores)")
+    parser.add_argument('--folds', type=int, default=3, help="Cross-validation folds for --tune (at least 2)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Update the online models with rows from batches they have not seen")
+    parser.add_argument('--refit', action='store_true', help="With --incremental, rebuild the online models from all rows")
+    parser.add_argument('--chunk-size', type=int, default=50_000, help="Rows per partial_fit call for --incremental")
+    args = parser.parse_args()
+    if args.folds < 2:
+        parser.error(f"--folds must be at least 2 (got {args.folds})")
+
     if not os.path.exists(MODEL_DIR):
         os.makedirs(MODEL_DIR)
-    train_models()
+    if args.incremental:
+        from models.incremental import update_models
+        update_models(refit=args.refit, chunk_size=args.chunk_size)
+    elif args.tune:
+        from models.tuning import tune_models
+        tune_models(budget=args.budget, jobs=args.jobs, folds=args.folds)
+    else:
+        train_models()
@@ -0,0 +1,331 @@
+import importlib
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database.connection import connect_write
+from database.watermarks import set_watermark
+from models.registry import save_model, frame_hash
+from models.train_model import DB_PATH, REGRESSION_FEATURES, CLASSIFIER_FEATURES, load_training_frame
+
+# Configuration
+TUNE_BUDGET = 600          # Wall-clock seconds for the whole search, refits included
+NUM_FOLDS = 3
+NUM_CANDIDATES = 27        # Sampled configurations entering the first rung
+HALVING_FACTOR = 3         # Each rung keeps 1/3 of the candidates on 3x the rows
+MIN_RESOURCE = 20_000      # Training rows per candidate in the first rung
+REFIT_RESERVE = 0.2        # Share of the budget held back for the refit until fit times are measured
+REFIT_SAFETY = 1.5         # Margin on the extrapolated refit time
+TEST_SIZE = 0.2
+SEED = 42
+
+# Model name -> (problem, features, target)
+PROBLEMS = {
+    'score_predictor': ('regression', REGRESSION_FEATURES, 'total_mark'),
+    'performance_classifier': ('classification', CLASSIFIER_FEATURES, 'performance_group'),
+}
+
+# (problem, family) -> estimator class; imported in the worker that fits it
+ESTIMATORS = {
+    ('regression', 'linear'): ('sklearn.linear_model', 'LinearRegression'),
+    ('regression', 'ridge'): ('sklearn.linear_model', 'Ridge'),
+    ('regression', 'hist_gradient_boosting'): ('sklearn.ensemble', 'HistGradientBoostingRegressor'),
+    ('regression', 'random_forest'): ('sklearn.ensemble', 'RandomForestRegressor'),
+    ('classification', 'random_forest'): ('sklearn.ensemble', 'RandomForestClassifier'),
+    ('classification', 'hist_gradient_boosting'): ('sklearn.ensemble', 'HistGradientBoostingClassifier'),
+}
+# Fixed per family; forests stay single-threaded because the pool supplies the parallelism
+FIXED_PARAMS = {
+    'random_forest': {'random_state': SEED, 'n_jobs': 1},
+    'hist_gradient_boosting': {'random_state': SEED},
+}
+
+# Search spaces: ('choice', values) | ('int', low, high) | ('log', low, high)
+FOREST_SPACE = {
+    'n_estimators': ('int', 30, 150),
+    'max_depth': ('choice', [8, 12, 16, None]),
+    'min_samples_leaf': ('int', 1, 50),
+    'max_features': ('choice', [1.0, 'sqrt']),
+}
+BOOSTING_SPACE = {
+    'learning_rate': ('log', 0.02, 0.3),
+    'max_leaf_nodes': ('int', 8, 64),
+    'max_iter': ('int', 50, 300),
+    'l2_regularization': ('log', 1e-4, 1.0),
+}
+SEARCH_SPACES = {
+    'regression': {
+        'linear': {},
+        'ridge': {'alpha': ('log', 1e-3, 1e3)},
+        'hist_gradient_boosting': BOOSTING_SPACE,
+        'random_forest': FOREST_SPACE,
+    },
+    'classification': {
+        'random_forest': FOREST_SPACE,
+        'hist_gradient_boosting': BOOSTING_SPACE,
+    },
+}
+
+
+def _make_estimator(problem, family, params):
+    module, name = ESTIMATORS[(problem, family)]
+    estimator = getattr(importlib.import_module(module), name)
+    return estimator(**{**FIXED_PARAMS.get(family, {}), **params})
+
+
+def _sample_params(rng, space):
+    params = {}
+    for name, spec in space.items():
+        if spec[0] == 'choice':
+            params[name] = spec[1][int(rng.integers(len(spec[1])))]
+        elif spec[0] == 'int':
+            params[name] = int(rng.integers(spec[1], spec[2] + 1))
+        else:
+            params[name] = float(np.exp(rng.uniform(np.log(spec[1]), np.log(spec[2]))))
+    return params
+
+
+def _sample_candidates(rng, spaces, count):
+    """`count` distinct (family, params) configurations, cycling through the families."""
+    families = list(spaces)
+    candidates, seen = [], set()
+    for i in range(count * 10):
+        if len(candidates) == count:
+            break
+        family = families[i % len(families)]
+        params = _sample_params(rng, spaces[family])
+        key = (family, repr(sorted(params.items(), key=lambda item: item[0])))
+        if key not in seen:
+            seen.add(key)
+            candidates.append({'family': family, 'params': params})
+    return candidates
+
+
+# Worker side: features, targets and fold indices are .npy files in the shared
+# cache directory, memory-mapped once per process and reused by every candidate.
+_MAPPED = {}
+
+
+def _mapped(path):
+    if path not in _MAPPED:
+        _MAPPED[path] = np.load(path, mmap_mode='r')
+    return _MAPPED[path]
+
+
+def _fold_paths(cache_dir, rung, fold):
+    return (os.path.join(cache_dir, f'rung{rung}_fold{fold}_train.npy'),
+            os.path.join(cache_dir, f'rung{rung}_fold{fold}_test.npy'))
+
+
+def _evaluate(task):
+    """Worker: fit one candidate on one fold and score it (higher is better)."""
+    cache_dir, problem, family, params, rung, fold = task
+    X = _mapped(os.path.join(cache_dir, 'X.npy'))
+    y = _mapped(os.path.join(cache_dir, 'y.npy'))
+    train_path, test_path = _fold_paths(cache_dir, rung, fold)
+    train, test = _mapped(train_path), _mapped(test_path)
+
+    start = time.perf_counter()
+    model = _make_estimator(problem, family, params)
+    model.fit(X[train], y[train])
+    predicted = model.predict(X[test])
+    if problem == 'regression':
+        score = -float(np.mean((predicted - y[test]) ** 2))
+    else:
+        score = float(np.mean(predicted == y[test]))
+    return score, time.perf_counter() - start
+
+
+def _write_folds(cache_dir, rung, rows, num_rows, folds, rng):
+    """Draw a `rows`-row subsample and save its k-fold train/test indices."""
+    subsample = np.sort(rng.permutation(num_rows)[:rows])
+    chunks = np.array_split(rng.permutation(subsample), folds)
+    for fold in range(folds):
+        train = np.sort(np.concatenate([chunk for i, chunk in enumerate(chunks) if i != fold]))
+        train_path, test_path = _fold_paths(cache_dir, rung, fold)
+        np.save(train_path, train)
+        np.save(test_path, np.sort(chunks[fold]))
+
+
+def _refit_estimate(fit_seconds, rows, num_rows, folds, candidate, jobs):
+    """Seconds to refit `candidate` on all `num_rows`, extrapolated from its fold fits on `rows`."""
+    # Fit time grows roughly linearly with rows; fold fits train on (folds - 1) / folds of them
+    estimate = fit_seconds * num_rows / (rows * (folds - 1) / folds) * REFIT_SAFETY
+    if candidate['family'] == 'random_forest':
+        # The refit spreads the trees over every core (see tune_models)
+        estimate /= max(1, min(jobs, candidate['params']['n_estimators']))
+    return estimate
+
+
+def _choose(rankings, remaining):
+    """Best entry of the latest rung that has one whose refit fits in `remaining` seconds, else None."""
+    for ranked in reversed(rankings):
+        for entry in ranked:
+            if entry[2] <= remaining:
+                return entry
+    return None
+
+
+def successive_halving(problem, X, y, budget, jobs=None, folds=NUM_FOLDS,
+                       num_candidates=NUM_CANDIDATES, seed=SEED):
+    """Successive-halving search with k-fold CV; returns (best candidate, report).
+
+    Rung r scores the surviving candidates on MIN_RESOURCE * HALVING_FACTOR**r
+    training rows and keeps the best 1/HALVING_FACTOR. `budget` covers the
+    search and the final refit. The search holds back the extrapolated
+    refit time of the candidate it would pick now (REFIT_RESERVE of the
+    budget until one has been scored) and stops when only that is left, or
+    when the next rung's extrapolated cost would not fit. Workers still
+    fitting then are terminated. The winner is the best candidate of the
+    latest rung whose refit fits in the remaining time; if none does, the
+    cheapest to refit is used and the budget is exceeded.
+    """
+    if folds < 2:
+        raise ValueError(f"Cross-validation needs at least 2 folds, got {folds}")
+    jobs = jobs or os.cpu_count() or 1
+    deadline = time.monotonic() + budget
+    rng = np.random.default_rng(seed)
+    candidates = _sample_candidates(rng, SEARCH_SPACES[problem], num_candidates)
+
+    num_rows = len(X)
+    resources = [min(MIN_RESOURCE, num_rows)]
+    while resources[-1] < num_rows:
+        resources.append(min(resources[-1] * HALVING_FACTOR, num_rows))
+
+    report = {'problem': problem, 'budget_seconds': budget, 'folds': folds, 'jobs': jobs,
+              'rows': num_rows, 'rungs': [], 'stopped_early': False}
+    # Per completed rung: (cv score, mean fold fit seconds, refit estimate, candidate), best first
+    rankings, prev_rows = [], None
+    refit_reserve = budget * REFIT_RESERVE
+
+    with tempfile.TemporaryDirectory(prefix='tune_') as cache_dir:
+        np.save(os.path.join(cache_dir, 'X.npy'), np.ascontiguousarray(X))
+        np.save(os.path.join(cache_dir, 'y.npy'), np.ascontiguousarray(y))
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for rung, rows in enumerate(resources):
+                if rankings:
+                    survivors = rankings[-1][:max(1, math.ceil(len(rankings[-1]) / HALVING_FACTOR))]
+                    candidates = [candidate for *_, candidate in survivors]
+                    if len(candidates) == 1:
+                        break
+                    # Stop if this rung plus the refit would overrun
+                    scale = rows / prev_rows
+                    work = sum(fit for _, fit, _, _ in survivors) * scale * folds
+                    rung_estimate = max(work / jobs, max(fit for _, fit, _, _ in survivors) * scale)
+                    if rung_estimate + refit_reserve > deadline - time.monotonic():
+                        report['stopped_early'] = True
+                        break
+
+                print(f"  rung {rung}: {len(candidates)} candidates x {folds} folds on {rows} rows")
+                rung_start = time.monotonic()
+                _write_folds(cache_dir, rung, rows, num_rows, folds, rng)
+                tasks = [
+                    (i, pool.apply_async(_evaluate, ((cache_dir, problem, c['family'], c['params'], rung, fold),)))
+                    for i, c in enumerate(candidates) for fold in range(folds)
+                ]
+                # Collect in submission order, re-deriving the reserve as candidates complete
+                scores, seconds, results = {}, {}, []
+                for i, result in tasks:
+                    result.wait(max(0.0, deadline - refit_reserve - time.monotonic()))
+                    if not result.ready():
+                        break
+                    score, fit_seconds = result.get()
+                    scores.setdefault(i, []).append(score)
+                    seconds.setdefault(i, []).append(fit_seconds)
+                    if len(scores[i]) == folds:
+                        fit = float(np.mean(seconds[i]))
+                        results.append((float(np.mean(scores[i])), fit,
+                                        _refit_estimate(fit, rows, num_rows, folds, candidates[i], jobs), candidates[i]))
+                        results.sort(key=lambda entry: entry[0], reverse=True)
+                        choice = _choose(rankings + [results], deadline - time.monotonic())
+                        refit_reserve = choice[2] if choice else budget * REFIT_RESERVE
+                report['rungs'].append({
+                    'rows': rows,
+                    'candidates': len(candidates),
+                    'completed': len(results),
+                    'seconds': round(time.monotonic() - rung_start, 2),
+                    'results': [{'score': score, 'fit_seconds': round(fit, 3), 'refit_estimate': round(estimate, 2),
+                                 **candidate} for score, fit, estimate, candidate in results],
+                })
+                if results:
+                    rankings.append(results)
+                    prev_rows = rows
+                if not all(result.ready() for _, result in tasks):
+                    report['stopped_early'] = True
+                    break
+        finally:
+            # Kill fits still running from a rung cut short, so they stop using cores now
+            pool.terminate()
+            pool.join()
+
+    if not rankings:
+        raise RuntimeError(f"Budget of {budget}s was too small to score any {problem} candidate")
+    choice = (_choose(rankings, deadline - time.monotonic())
+              or min(rankings[-1], key=lambda entry: entry[2]))
+    best_score, _, estimate, best = choice
+    report['best'] = {'score': best_score, 'refit_estimate_seconds': round(estimate, 2), **best}
+    return best, report
+
+
+def tune_models(budget=TUNE_BUDGET, jobs=None, folds=NUM_FOLDS, num_candidates=NUM_CANDIDATES):
+    """Search hyperparameters for both models within `budget` seconds and register the winners."""
+    from sklearn.model_selection import train_test_split
+    jobs = jobs or os.cpu_count() or 1
+    start = time.monotonic()
+
+    print(f"Tuning ML models ({budget}s budget, {jobs} jobs)...")
+    df, version = load_training_frame(DB_PATH)
+    batch = version['batch']
+    if df.empty:
+        print("No data found!")
+        return
+    train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=TEST_SIZE, random_state=SEED)
+
+    for i, (name, (problem, features, target)) in enumerate(PROBLEMS.items()):
+        # Split what is left of the budget evenly over the remaining models
+        share = (budget - (time.monotonic() - start)) / (len(PROBLEMS) - i)
+        print(f"Searching {name} ({share:.0f}s)...")
+        X = df[features].to_numpy(dtype=np.float64)
+        labels = df[target].to_numpy()
+        # Targets must be numeric to memory-map; class labels are searched as codes
+        y = labels.astype(np.float64) if problem == 'regression' else np.unique(labels, return_inverse=True)[1]
+
+        best, report = successive_halving(problem, X[train_idx], y[train_idx], share, jobs, folds, num_candidates)
+        print(f"  best: {best['family']} {best['params']} (cv score {report['best']['score']:.4f}, "
+              f"refit estimate {report['best']['refit_estimate_seconds']:.1f}s)")
+
+        # Refit the winner on the full training split, using every core for forests
+        params = dict(best['params'])
+        if best['family'] == 'random_forest':
+            params['n_jobs'] = jobs
+        fit_start = time.perf_counter()
+        model = _make_estimator(problem, best['family'], params)
+        model.fit(X[train_idx], labels[train_idx])
+        fit_seconds = time.perf_counter() - fit_start
+        predicted = model.predict(X[test_idx])
+        if problem == 'regression':
+            metrics = {'mse': float(np.mean((predicted - labels[test_idx]) ** 2))}
+        else:
+            metrics = {'accuracy': float(np.mean(predicted == labels[test_idx]))}
+        print(f"  holdout {metrics}")
+
+        report['refit_seconds'] = round(fit_seconds, 2)
+        report['total_seconds'] = round(time.monotonic() - start, 2)
+        meta = save_model(
+            name, model, features, batch, metrics, fit_seconds, frame_hash(df[features + [target]]),
+            rows=len(train_idx), target=target, params={'family': best['family'], **best['params']}, report=report,
+            data_version=version,
+        )
+        print(f"Saved {name} v{meta['version']}")
+
+    # Models now reflect every batch up to `batch`
+    conn = connect_write(DB_PATH)
+    set_watermark(conn, 'train', batch)
+    conn.close()
+    print(f"Tuning finished in {time.monotonic() - start:.1f}s.")
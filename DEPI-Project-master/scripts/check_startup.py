@@ -0,0 +1,74 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Run from the project root: python scripts/check_startup.py
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point -> (startup budget in ms, modules that must not load at startup).
+# Budgets leave headroom over a typical run; the forbidden lists are the real guard.
+ENTRY_POINTS = {
+    'database/db_manager.py': (400, ['pandas', 'faker', 'sklearn', 'matplotlib']),
+    'database/query_registry.py': (400, ['pandas', 'faker', 'sklearn', 'matplotlib']),
+    'analysis/eda.py': (1000, ['matplotlib', 'seaborn', 'sklearn', 'faker']),
+    'models/train_model.py': (1000, ['sklearn', 'matplotlib', 'seaborn', 'faker']),
+    'models/batch_score.py': (600, ['pandas', 'sklearn', 'matplotlib', 'faker']),
+    'models/kernels.py': (600, ['pandas', 'sklearn', 'matplotlib', 'faker']),
+}
+
+
+def measure(script):
+    """Import-time profile of a script's module body (its __main__ block is not run).
+
+    Returns (total cumulative microseconds, set of top-level packages imported).
+    """
+    code = f"import runpy; runpy.run_path({script!r}, run_name='startup_check')"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} failed to load:\n{result.stderr}")
+
+    total, packages = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        packages.add(name.strip().split('.')[0])
+        # Only unindented names are top-level imports; nested ones are already in their parent
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return total, packages
+
+
+def check(scripts=None, slack=1.0):
+    """Print each entry point's startup time; return the list of failures."""
+    failures = []
+    for script in scripts or ENTRY_POINTS:
+        budget_ms, forbidden = ENTRY_POINTS[script]
+        total_us, packages = measure(script)
+        ms = total_us / 1000
+        loaded = sorted(set(forbidden) & packages)
+        status = 'ok'
+        if loaded:
+            status = 'FAIL'
+            failures.append(f"{script} imports {', '.join(loaded)} at startup")
+        if ms > budget_ms * slack:
+            status = 'FAIL'
+            failures.append(f"{script} startup {ms:.0f} ms exceeds budget {budget_ms * slack:.0f} ms")
+        print(f"{status:4}  {script:28} {ms:7.0f} ms (budget {budget_ms} ms)")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail when entry-point import time regresses.")
+    parser.add_argument('scripts', nargs='*', help="Entry points to check (default: all)")
+    parser.add_argument('--slack', type=float, default=1.0, help="Multiply every budget (e.g. 1.5 on slow CI hosts)")
+    args = parser.parse_args()
+
+    failures = check(args.scripts, args.slack)
+    for failure in failures:
+        print(f"  - {failure}")
+    sys.exit(1 if failures else 0)